@@ -0,0 +1,445 @@
+import numpy as np
+from bisect import bisect_right
+import Topology as tp
+import GraphSearch as gs
+import GenerationFunctions as gf
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# Analytical RELRAD on the radial tree of the system. Every segment of a fault is a subtree with the subtrees of the
+# disconnected sections below it removed, and is identified by its top bus. The contribution of a fault to the load
+# points of a segment is added at the top bus and subtracted at the top bus of the next segment below it, and one
+# pass down the tree gives the indices of every load point. The cost of a fault depends on the number of disconnected
+# section ends and backup feeders rather than the size of the system.
+
+AGGREGATES = (('customers', 'busCustomers'), ('peakLoad', 'busPeakLoad'), ('averageLoad', 'busAverageLoad'),
+              ('generation', 'busGeneration'), ('constantGeneration', 'busConstantGeneration'), ('storage', 'busStorage'))
+
+
+def compileTree(topology):
+    """
+    Prepares the radial tree of the system: the upstream bus of each bus, the preorder numbering of the buses and the
+    load and generation of each subtree (summed bottom-up).
+
+    Args:
+        topology (dict): The compiled topology, with the fault zones.
+
+    Returns:
+        dict: The tree.
+            parent/root: upstream bus (NO_BUS for the top of a feeder) and top of the feeder of each bus
+            nearestMain: the nearest main feeder at or above each bus (NO_BUS if none)
+            tin/tout: preorder number of each bus and the last preorder number in its subtree
+            preorder: the buses in preorder
+            preorderMin: sparse table of the lowest bus number, preorderMin[k][n] is the lowest of the 2**k buses from preorder number n
+            subtree: sums of the segment aggregates (see GraphSearch.segmentAggregates) of each subtree
+            mainFeeders: number of main feeders in each subtree
+            fixedRoots: feeder tops that are not main feeders, or that have backup feeders
+            feederEnds: list of (bus, backup feeder, other end, top of the subtree supplied through the backup feeder)
+    """
+    upstreamBus = topology['upstreamBus']
+    downstreamBus = topology['downstreamBus']
+    upstreamSection = topology['upstreamSection']
+    mainFeeder = topology['mainFeeder']
+    nrBuses = len(topology['busLabels'])
+
+    # The graph searches only follow the upstream section of each bus, the system is radial if every section with
+    # two buses is the upstream section of its downstream bus and every bus can be reached from a feeder top
+    for sec in range(len(topology['sectionLabels'])):
+        if upstreamBus[sec] != tp.NO_BUS and downstreamBus[sec] != tp.NO_BUS and upstreamSection[downstreamBus[sec]] != sec:
+            raise ValueError('Section %s is not the upstream section of its downstream bus, the system is not radial' % topology['sectionLabels'][sec])
+    parent = np.full(nrBuses, tp.NO_BUS, dtype=np.int32)
+    for bus in range(nrBuses):
+        if upstreamSection[bus] != tp.NO_BUS:
+            parent[bus] = upstreamBus[upstreamSection[bus]]
+    order = topology['busOrder'].tolist()
+    position = np.empty(nrBuses, dtype=np.int64)
+    position[order] = np.arange(nrBuses)
+    for bus in range(nrBuses):
+        if parent[bus] != tp.NO_BUS and position[parent[bus]] > position[bus]:
+            raise ValueError('Bus %s is part of a loop, the system is not radial' % topology['busLabels'][bus])
+
+    # Preorder numbering, the subtree of a bus is the buses numbered from tin to tout
+    children = [[] for i in range(nrBuses)]
+    root = np.empty(nrBuses, dtype=np.int32)
+    nearestMain = np.full(nrBuses, tp.NO_BUS, dtype=np.int32)
+    for bus in order:
+        if parent[bus] == tp.NO_BUS:
+            root[bus] = bus
+        else:
+            root[bus] = root[parent[bus]]
+            nearestMain[bus] = nearestMain[parent[bus]]
+            children[parent[bus]].append(bus)
+        if mainFeeder[bus]:
+            nearestMain[bus] = bus
+    tin = np.empty(nrBuses, dtype=np.int64)
+    tout = np.empty(nrBuses, dtype=np.int64)
+    preorder = np.empty(nrBuses, dtype=np.int32)
+    n = 0
+    for top in order:
+        if parent[top] != tp.NO_BUS:
+            continue
+        stack = [(top, iter(children[top]))]
+        tin[top] = n
+        preorder[n] = top
+        n += 1
+        while stack:
+            bus, below = stack[-1]
+            for child in below:
+                tin[child] = n
+                preorder[n] = child
+                n += 1
+                stack.append((child, iter(children[child])))
+                break
+            else:
+                tout[bus] = n - 1
+                stack.pop()
+    preorderMin = [preorder]
+    while 2 ** len(preorderMin) <= nrBuses:
+        half = 2 ** (len(preorderMin) - 1)
+        preorderMin.append(np.minimum(preorderMin[-1][:-half], preorderMin[-1][half:]))
+
+    # Bottom-up sums of the load and generation of each subtree
+    subtree = {key: topology[busKey].copy() for key, busKey in AGGREGATES}
+    mainFeeders = mainFeeder.astype(np.int64)
+    for bus in reversed(order):
+        if parent[bus] != tp.NO_BUS:
+            for key in subtree:
+                subtree[key][parent[bus]] += subtree[key][bus]
+            mainFeeders[parent[bus]] += mainFeeders[bus]
+
+    # The backup feeders and the protection on the other end, the loads supplied through a backup feeder are the
+    # subtree below the protection (see the Down Stream Effect of Backup Feeder in EffectOfFault.faultOutcome)
+    feederEnds = []
+    fixedRoots = {bus for bus in order if parent[bus] == tp.NO_BUS and not mainFeeder[bus]}
+    ends = topology['backupFeederEnds']
+    for bus in range(nrBuses):
+        for feeder in topology['busBackupFeeders'][topology['busBackupFeederPtr'][bus]:topology['busBackupFeederPtr'][bus + 1]]:
+            otherEnd = ends[feeder][1] if bus == ends[feeder][0] else ends[feeder][0]
+            region = None
+            if otherEnd != tp.NO_BUS:
+                breaker = gs.findProtection(otherEnd, topology)
+                if breaker is not None:
+                    region = downstreamBus[breaker['section']] if breaker['section'] != tp.NO_BUS and upstreamBus[breaker['section']] != tp.NO_BUS else tp.NO_BUS
+                fixedRoots.add(root[otherEnd])
+            feederEnds.append((bus, feeder, otherEnd, region))
+            fixedRoots.add(root[bus])
+
+    return {
+        'parent': parent,
+        'root': root,
+        'nearestMain': nearestMain,
+        'tin': tin,
+        'tout': tout,
+        'preorder': preorder,
+        'preorderMin': preorderMin,
+        'subtree': subtree,
+        'mainFeeders': mainFeeders,
+        'fixedRoots': fixedRoots,
+        'feederEnds': feederEnds,
+    }
+
+
+def nestTops(tops, tree):
+    """
+    Orders the top buses of the segments by their preorder number and finds the top of the segment above each one.
+
+    Args:
+        tops (set): The top buses.
+        tree (dict): The tree from compileTree.
+
+    Returns:
+        dict: The top buses (tops), their preorder numbers (tins) and the top above each top bus (above).
+    """
+    tin = tree['tin']
+    tout = tree['tout']
+    tops = sorted(tops, key=lambda bus: tin[bus])
+    above = {}
+    stack = []
+    for top in tops:
+        while stack and tout[stack[-1]] < tin[top]:
+            stack.pop()
+        above[top] = stack[-1] if stack else tp.NO_BUS
+        stack.append(top)
+    return {'tops': tops, 'tins': [tin[top] for top in tops], 'above': above}
+
+
+def segmentTop(bus, nest, tree):
+    """
+    Finds the top bus of the segment containing a bus.
+
+    Args:
+        bus (int): The bus.
+        nest (dict): The top buses from nestTops.
+        tree (dict): The tree from compileTree.
+
+    Returns:
+        int: The top bus, or NO_BUS if the bus is below none of the top buses.
+    """
+    tin = tree['tin'][bus]
+    i = bisect_right(nest['tins'], tin) - 1
+    top = nest['tops'][i] if i >= 0 else tp.NO_BUS
+    while top != tp.NO_BUS and tree['tout'][top] < tin:
+        top = nest['above'][top]
+    return top
+
+
+def firstBus(top, below, tree):
+    """
+    Finds the bus with the lowest number in a segment, i.e. the bus GraphSearch.labelSegments starts the segment from.
+    The segment is the preorder ranges between the segments below, each range is looked up in the sparse table.
+
+    Args:
+        top (int): The top bus of the segment.
+        below (list): The top buses of the segments right below the segment, in preorder.
+        tree (dict): The tree from compileTree.
+
+    Returns:
+        int: The bus.
+    """
+    first = len(tree['preorder'])
+    start = tree['tin'][top]
+    for bus in below:
+        if start < tree['tin'][bus]:
+            first = min(first, preorderMin(start, tree['tin'][bus] - 1, tree))
+        start = tree['tout'][bus] + 1
+    if start <= tree['tout'][top]:
+        first = min(first, preorderMin(start, tree['tout'][top], tree))
+    return first
+
+def preorderMin(first, last, tree):
+    """
+    Finds the lowest bus number among the buses with preorder numbers from first to last from the sparse table.
+
+    Args:
+        first (int): The first preorder number.
+        last (int): The last preorder number.
+        tree (dict): The tree from compileTree.
+
+    Returns:
+        int: The bus.
+    """
+    k = int(last - first + 1).bit_length() - 1
+    table = tree['preorderMin'][k]
+    return int(min(table[first], table[last - 2 ** k + 1]))
+
+
+def openEnds(openUpstream, openDownstream, topology):
+    """
+    Finds the buses below the disconnected sections, i.e. the top buses of the segments that are not feeder tops.
+
+    Args:
+        openUpstream (frozenset): Sections with the upstream end disconnected.
+        openDownstream (frozenset): Sections with the downstream end disconnected.
+        topology (dict): The compiled topology.
+
+    Returns:
+        set: The buses.
+    """
+    upstreamBus = topology['upstreamBus']
+    downstreamBus = topology['downstreamBus']
+    return {downstreamBus[sec] for sec in openUpstream | openDownstream
+            if upstreamBus[sec] != tp.NO_BUS and downstreamBus[sec] != tp.NO_BUS}
+
+
+def faultContributions(fault, components, tree, topology, DSEBF=True, DERS=False):
+    """
+    Calculates the contributions of the components of a faulted section to the failure rate and unavailability of the
+    load points, with the same segments, switching times, backup feeders and distributed generation as
+    EffectOfFault.faultEffects.
+
+    Args:
+        fault (int): The faulted section.
+        components (list): Failure rate and repair time (lambda, r) of each component in the section.
+        tree (dict): The tree from compileTree.
+        topology (dict): The compiled topology, with the fault zones.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+
+    Returns:
+        tuple: Failure rate and unavailability for all load points (fullSystemDown), and a list of
+            (top bus, failure rate, unavailability) for the load points of the segment below each top bus.
+    """
+    zone = topology['faultZones'][fault]
+    if zone['fullSystemDown']:
+        return sum(l for l, r in components if r > 0), sum(l * r for l, r in components if r > 0), []
+
+    s = zone['s']
+    tin = tree['tin']
+    tout = tree['tout']
+    root = tree['root']
+
+    # Segments with the protection tripped and the disconnectors opened (stage 1), and after the protection is reconnected (stage 2)
+    stage1 = openEnds(zone['isolatedUpstream'], zone['isolatedDownstream'], topology)
+    stage2 = openEnds(zone['reconnectedUpstream'], zone['reconnectedDownstream'], topology)
+    faultEnds = []
+    if topology['upstreamBus'][fault] != tp.NO_BUS and fault not in zone['reconnectedUpstream']:
+        faultEnds.append(topology['upstreamBus'][fault])
+    if topology['downstreamBus'][fault] != tp.NO_BUS and fault not in zone['reconnectedDownstream']:
+        faultEnds.append(topology['downstreamBus'][fault])
+    switchingTimes = {bus: zone['switchingTimes'][bus] for bus in zone['switchingTimes'] if bus != tp.NO_BUS}
+    roots = tree['fixedRoots'] | {root[bus] for bus in stage1} | {root[bus] for bus in faultEnds} | {root[bus] for bus in switchingTimes}
+    nest1 = nestTops(stage1 | roots, tree)
+    nest2 = nestTops(stage2 | roots, tree)
+
+    # Switching time of the stage 1 segments, the disconnector ends in a segment other than the faulted one all have the same switching time
+    trippedTime = {}
+    for bus in switchingTimes:
+        top = segmentTop(bus, nest1, tree)
+        trippedTime[top] = max(trippedTime.get(top, 0), switchingTimes[bus])
+
+    # State of the stage 2 segments, a bus is connected to a main feeder if there is one above it in the segment (the
+    # buses below no top bus are all connected), and a segment has the state of its first bus
+    def energized(top, bus):
+        if top == tp.NO_BUS:
+            return True
+        main = tree['nearestMain'][bus]
+        return main != tp.NO_BUS and tin[main] >= tin[top]
+    below = {top: [] for top in nest2['tops']}
+    for top in nest2['tops']:
+        if nest2['above'][top] != tp.NO_BUS:
+            below[nest2['above'][top]].append(top)
+    faultSegments = {segmentTop(bus, nest2, tree) for bus in faultEnds}
+    aggregates = {}
+    for top in nest2['tops']:
+        if top in faultSegments:
+            continue
+        if tree['mainFeeders'][top] - sum(tree['mainFeeders'][bus] for bus in below[top]) > 0:
+            if energized(top, firstBus(top, below[top], tree)):
+                continue
+        aggregates[top] = {key: tree['subtree'][key][top] for key in tree['subtree']}
+        for bus in below[top]:
+            for key in tree['subtree']:
+                aggregates[top][key] -= tree['subtree'][key][bus]
+
+    # Backup feeders of the unsupplied segments that are connected to a main feeder on the other end
+    hasBackupFeeders = set()
+    feeders = {top: [] for top in aggregates}
+    regions = []
+    for bus, n, otherEnd, region in tree['feederEnds']:
+        top = segmentTop(bus, nest2, tree)
+        if top not in aggregates:
+            continue
+        hasBackupFeeders.add(top)
+        if otherEnd == tp.NO_BUS:
+            continue
+        otherTop = segmentTop(otherEnd, nest2, tree)
+        if not energized(otherTop, otherEnd):
+            continue
+        feeder = {'s': topology['backupFeederS'][n], 'region': None}
+        if DSEBF and region is not None:
+            feeder['region'] = len(regions)
+            regions.append((region, otherTop))
+        feeders[top].append(feeder)
+
+    # The load points of a piece between top buses are in one stage 1 segment, one stage 2 segment and either in or out of each backup feeder region
+    pieces = nestTops(set(nest1['tops']) | {region for region, otherTop in regions if region != tp.NO_BUS}, tree)
+    pieceData = []
+    for top in pieces['tops']:
+        top2 = segmentTop(top, nest2, tree)
+        inRegions = [n for n, (region, otherTop) in enumerate(regions)
+                     if top2 == otherTop and (region == tp.NO_BUS or tin[region] <= tin[top] <= tout[region])]
+        pieceData.append((top, trippedTime.get(segmentTop(top, nest1, tree), 0), top2, inRegions))
+
+    contributions = {top: [0, 0] for top in pieces['tops']}
+    for l, r in components:
+        r = max(r, s)
+        # Outage time of the unsupplied segments and the active backup feeder regions
+        segmentTime = {}
+        activeRegions = set()
+        for top in aggregates:
+            if DERS:
+                uBackup = gf.segmentDistributedGeneration(aggregates[top], r, s)
+            else:
+                uBackup = r
+            time = 0
+            if top in hasBackupFeeders:
+                for j in feeders[top]:
+                    if j['s'] < uBackup:
+                        time = max(time, j['s'])
+                        if j['region'] is not None:
+                            activeRegions.add(j['region'])
+                    elif DERS:
+                        time = max(time, uBackup)
+            elif DERS and uBackup < r:
+                time = uBackup
+            else:
+                time = r
+            segmentTime[top] = time
+        for top, time, top2, inRegions in pieceData:
+            if top2 in faultSegments:
+                time = max(time, r)
+            elif top2 in segmentTime:
+                time = max(time, segmentTime[top2])
+            if any(n in activeRegions for n in inRegions):
+                time = max(time, s)
+            if time > 0:
+                contributions[top][0] += l
+                contributions[top][1] += l * time
+
+    # The segment below each top bus gets its own contribution, i.e. its contribution less the one of the segment above
+    result = []
+    for top in pieces['tops']:
+        above = pieces['above'][top]
+        if above == tp.NO_BUS:
+            result.append((top, contributions[top][0], contributions[top][1]))
+        else:
+            result.append((top, contributions[top][0] - contributions[above][0], contributions[top][1] - contributions[above][1]))
+    return 0, 0, result
+
+
+def loadPointIndices(system, DSEBF=True, DERS=False):
+    """
+    Calculates the failure rate and unavailability of every load point with the analytical RELRAD, i.e. the same
+    results as the evaluation of every component with EffectOfFault.faultEffects.
+
+    Args:
+        system (dict): The system from CreateSystem.createSystem.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+
+    Returns:
+        tuple: Arrays with the failure rate and unavailability of the load points (in the order of the loads).
+    """
+    topology = system['topology']
+    tree = compileTree(topology)
+    nrBuses = len(topology['busLabels'])
+    Lambda = np.zeros(nrBuses)
+    U = np.zeros(nrBuses)
+    allLambda = 0
+    allU = 0
+    for sec in system['sections'].index:
+        components = [(c['lambda'], c['r']) for c in system['sections']['Components'][sec].values()]
+        l, u, result = faultContributions(topology['sectionIndex'][sec], components, tree, topology, DSEBF=DSEBF, DERS=DERS)
+        allLambda += l
+        allU += u
+        for top, l, u in result:
+            Lambda[top] += l
+            U[top] += u
+
+    # Top-down pass, every bus gets the contributions added at the buses above it
+    parent = tree['parent']
+    for bus in topology['busOrder'].tolist():
+        if parent[bus] != tp.NO_BUS:
+            Lambda[bus] += Lambda[parent[bus]]
+            U[bus] += U[parent[bus]]
+
+    loadBus = topology['loadBus']
+    LPLambda = np.where(loadBus != tp.NO_BUS, Lambda[loadBus], 0) + allLambda
+    LPU = np.where(loadBus != tp.NO_BUS, U[loadBus], 0) + allU
+    return LPLambda, LPU
@@ -1,4 +1,9 @@
 import pandas as pd
+import hashlib
+import os
+import pickle
+import Topology as tp
+import GraphSearch as gs
 
 '''
 RELRAD-software, general software for reliability studies of radial power systems
@@ -18,16 +23,47 @@ RELRAD-software, general software for reliability studies of radial power system
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
-def createSystem(file_path, LoadCurve = False):
+CACHE_VERSION = 6  # Increase when the layout of the compiled system changes, invalidates old cache files
+
+
+def createSystem(file_path, LoadCurve = False, cache = False, cacheDir = None):
     """
     Creates the system by reading data from Excel files.
 
     Args:
         file_path (str): Path to the Excel file containing system data.
+        LoadCurve (bool, optional): Flag indicating if the load curve data should be read. Defaults to False.
+        cache (bool, optional): Flag indicating if the compiled system should be read from/written to the system cache. Defaults to False.
+        cacheDir (str, optional): Folder for the cache files. Defaults to a '.relrad_cache' folder next to the Excel file.
 
     Returns:
         dict: A dictionary containing data about buses, sections, loads, components, backup feeders, and generation.
     """
+    if cache:
+        cacheFile = systemCachePath(file_path, LoadCurve, cacheDir)
+        system = loadSystemCache(cacheFile)
+        if system is not None:
+            return system
+
+    system = readSystem(file_path, LoadCurve)
+
+    if cache:
+        saveSystemCache(system, cacheFile)
+    return system
+
+
+
+def readSystem(file_path, LoadCurve = False):
+    """
+    Reads the system data from the Excel file and compiles it (topology and failure rates).
+
+    Args:
+        file_path (str): Path to the Excel file containing system data.
+        LoadCurve (bool, optional): Flag indicating if the load curve data should be read. Defaults to False.
+
+    Returns:
+        dict: A dictionary containing data about buses, sections, loads, components, backup feeders, generation, and the compiled topology.
+    """
     system = {}
     # Load data for buses, sections, loads, components, backup feeders, and generation
     system['buses'] = pd.read_excel(file_path, 'Bus Data', index_col=0)
@@ -56,6 +92,10 @@ def createSystem(file_path, LoadCurve = False):
     system['buses'] = fixbuses(system['buses'], system['sections'])
     system['sections'] = calcFailRates(system['sections'], system['components'])
 
+    # Compile the integer indexed topology used by the graph searches
+    system['topology'] = tp.compileTopology(system['buses'], system['sections'], system['generationData'], system['backupFeeders'], system['loads'])
+    system['topology']['faultZones'] = gs.compileFaultZones(system['topology'])
+
     if LoadCurve:
         # Load load curve data from Excel file
         loadCurveData = {}
@@ -67,6 +107,82 @@ def createSystem(file_path, LoadCurve = False):
 
 
 
+def systemCachePath(file_path, LoadCurve = False, cacheDir = None):
+    """
+    Finds the cache file for a system. The name contains a hash of the content of the Excel file, so any change to the file gives a new cache file.
+
+    Args:
+        file_path (str): Path to the Excel file containing system data.
+        LoadCurve (bool, optional): Flag indicating if the load curve data is included. Defaults to False.
+        cacheDir (str, optional): Folder for the cache files. Defaults to a '.relrad_cache' folder next to the Excel file.
+
+    Returns:
+        str: Path to the cache file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(('LoadCurve=%s;version=%d' % (bool(LoadCurve), CACHE_VERSION)).encode())
+
+    if cacheDir is None:
+        cacheDir = os.path.join(os.path.dirname(os.path.abspath(file_path)), '.relrad_cache')
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    if LoadCurve:
+        name += '-LoadCurve'
+    return os.path.join(cacheDir, name + '.' + digest.hexdigest()[:24] + '.pkl')
+
+
+
+def loadSystemCache(cacheFile):
+    """
+    Loads a compiled system from the cache.
+
+    Args:
+        cacheFile (str): Path to the cache file.
+
+    Returns:
+        dict: The compiled system, or None if there is no valid cache file.
+    """
+    if not os.path.isfile(cacheFile):
+        return None
+    try:
+        with open(cacheFile, 'rb') as f:
+            data = pickle.load(f)
+    except Exception: # Corrupt or incompatible cache file, the system is rebuilt
+        return None
+    if data.get('version') != CACHE_VERSION:
+        return None
+    return data['system']
+
+
+
+def saveSystemCache(system, cacheFile):
+    """
+    Saves a compiled system to the cache, and removes old cache files for the same Excel file.
+
+    Args:
+        system (dict): The compiled system.
+        cacheFile (str): Path to the cache file.
+    """
+    cacheDir = os.path.dirname(cacheFile)
+    os.makedirs(cacheDir, exist_ok=True)
+
+    # Removes cache files from older versions of the same Excel file (same name, different hash)
+    name, digest = os.path.basename(cacheFile).rsplit('.', 2)[:2]
+    for oldFile in os.listdir(cacheDir):
+        parts = oldFile.rsplit('.', 2)
+        if len(parts) == 3 and parts[0] == name and parts[1] != digest and parts[2] == 'pkl':
+            os.remove(os.path.join(cacheDir, oldFile))
+
+    # Writes to a temporary file first so a parallel run never reads a half written file
+    tmpFile = cacheFile + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpFile, 'wb') as f:
+        pickle.dump({'version': CACHE_VERSION, 'system': system}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpFile, cacheFile)
+
+
+
 def fixbuses(buses, sections):
     """
     Updates the buses DataFrame with upstream, downstream, and connected sections.
@@ -1,7 +1,6 @@
-import pandas as pd
 import GraphSearch as gs
-import MiscFunctions as mf
 import GenerationFunctions as gf
+import Topology as tp
 
 
 '''
@@ -22,190 +21,254 @@ RELRAD-software, general software for reliability studies of radial power system
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
-def faultEffects(fault, component, buses, sections, loads, generationData, backupFeeders, r, loadCurve=0, DSEBF = True, RNG=False, DERS = False, createFIM=False):
+def createFaultCache():
+    """
+    Creates a cache for the structural outcome of faults, to be shared by the fault analyses of one run.
+
+    Returns:
+        dict: The fault cache, with the outcomes by (section, DSEBF) and hit/miss counters. The outcome does not depend
+            on DERS, they are only used when the outcome is resolved for a fault duration (see resolveFaultOutcome).
+    """
+    return {'outcomes': {}, 'hits': 0, 'misses': 0}
+
+def faultEffects(fault, component, topology, loads, generationData, r, loadCurve=0, DSEBF = True, DERS = False, createFIM=False, faultCache=None):
     """
     Calculates the effects of a fault on the system.
 
     Args:
-        fault (int): The faulted section.
+        fault (str): The faulted section.
         component (str): The component affected by the fault (not in use anymore).
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): Topology overlay of the compiled topology (is updated).
         loads (DataFrame): Data about loads in the system.
         generationData (DataFrame): Data about generation in the system.
-        backupFeeders (DataFrame): Data about backup feeders in the system.
         r (int): The fault duration.
         DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
-        RNG (bool, optional): Flag indicating if random number generation is used. Defaults to False.
+        faultCache (dict, optional): Fault cache from createFaultCache, the graph search is only done the first time a section fails. Defaults to None.
 
     Returns:
         dict: Effects of the fault on load points.
     """
 
-    # Initialize a list to store the effects on sections
-    effectsOnSections = []
+    fault = topology['sectionIndex'][fault]
 
-    # Trip protection devices and check if the entire system is down
-    buses, sections, trippedProtection, fullSystemDown = gs.tripProtection(fault, buses, sections)
+    # Find the structural outcome of the fault, from the cache if it is available
+    if faultCache is not None:
+        key = (fault, DSEBF)
+        outcome = faultCache['outcomes'].get(key)
+        if outcome is None:
+            faultCache['misses'] += 1
+            outcome = faultOutcome(fault, topology, loads, DSEBF)
+            faultCache['outcomes'][key] = outcome
+        else:
+            faultCache['hits'] += 1
+    else:
+        outcome = faultOutcome(fault, topology, loads, DSEBF)
 
-    #print('tripped protection', trippedProtection) #Debugging line
+    # Find the outage time of each segment for the fault duration
+    effectsOnSections = resolveFaultOutcome(outcome, r, DERS)
 
-    # If the entire system is down, return fault duration for all load points
-    if fullSystemDown:
-        effectsOnLPs = {}
-        effectsOnSections.append({
-            'state': 'fullSystemDown',
-            'loads': loads.index.tolist(),
-            'time': r
-        })
-        for i, row in loads.iterrows():
-            effectsOnLPs[i] = r
-        if createFIM:
-            return effectsOnLPs, effectsOnSections
-        else:
-            return effectsOnLPs
+    # Aggregate the effects on load points
+    effectsOnLPs = {}
+    for i in effectsOnSections:
+        for LP in i['loads']:
+            if LP in effectsOnLPs:
+                if i['time'] is None:
+                    i['time'] = 0
+                elif i['time'] > effectsOnLPs[LP]:
+                    effectsOnLPs[LP] = i['time']
+            else:
+                if i['time'] is None:
+                    effectsOnLPs[LP] = 0
+                else:
+                    effectsOnLPs[LP] = i['time']
 
-    # Isolate the faulted section and identify disconnectors
-    buses, sections, disconnectors = gs.disconnect(fault, buses, sections)
+    # Return the final effects on load points
+    if createFIM:
+        return effectsOnLPs, effectsOnSections
+    else:
+        return effectsOnLPs
 
-    #print('disconnectors:', disconnectors)  #Debugging line
+def faultOutcome(fault, topology, loads, DSEBF=True):
+    """
+    Finds the structural outcome of a fault from its precomputed fault zone, i.e. everything that does not depend on the
+    fault duration: the segments, their switching times and the backup feeders that can supply them.
 
-    # Determine the maximum switching time among disconnectors
-    s = 0
-    for i in disconnectors:
-        if i['s'] > s:
-            s = i['s']
+    Args:
+        fault (int): The faulted section.
+        topology (dict): Topology overlay of the compiled topology (is updated).
+        loads (DataFrame): Data about loads in the system.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
 
-    r = max(r, s)  # Ensure r is at least as long as the maximum switching time (mostly to avoid errors from negative values)
+    Returns:
+        dict: The outcome of the fault.
+            fullSystemDown: flag for faults that are not cleared by any protection
+            loads: all load points (only for fullSystemDown)
+            s: the maximum switching time of the disconnectors
+            segments: list of segments with state 'tripped', 'fault', 'connected' or 'unsupplied', their load points and
+                peak load (the unsupplied segments also have their buses, load and generation aggregates, DER
+                capacity and backup feeders, with the load points and peak load on the secondary side of each feeder)
+    """
 
-    # Calculate switching times for each bus
-    switchingTimes = {}
-    for i in disconnectors:
-        if i['fromBus'] not in switchingTimes:
-            switchingTimes[i['fromBus']] = i['s']
-        else:
-            if i['s'] > switchingTimes[i['fromBus']]:
-                switchingTimes[i['fromBus']] = i['s']
-        if i['toBus'] not in switchingTimes:
-            switchingTimes[i['toBus']] = i['s']
-        else:
-            if i['s'] > switchingTimes[i['toBus']]:
-                switchingTimes[i['toBus']] = i['s']
+    # Look up the precomputed protection and disconnector zone of the fault
+    zone = topology['faultZones'][fault]
 
-    # Identify all isolated interconnections in the system
-    disconnectedSections = gs.findConnectedSegments(buses, sections)
+    # If the entire system is down, all load points are out for the fault duration
+    if zone['fullSystemDown']:
+        return {'fullSystemDown': True, 'loads': loads.index.tolist()}
 
-    #print('disconnected sections:', disconnectedSections)  # Debugging line
+    # Trip the protection and isolate the faulted section with the disconnectors
+    tp.setOpenEnds(zone['isolatedUpstream'], zone['isolatedDownstream'], topology)
+    s = zone['s']
+    switchingTimes = zone['switchingTimes']
 
-    # Record the effects on disconnected sections
-    for i in disconnectedSections:
-        effectsOnSections.append({
+    segments = []
+
+    # Identify all isolated interconnections in the system
+    labels, disconnectedSections = gs.labelSegments(topology)
+    segmentLoads = gs.segmentLoadPoints(labels, len(disconnectedSections), topology)
+    peakLoads = gs.segmentPeakLoads(labels, len(disconnectedSections), topology)
+
+    # Record the disconnected sections
+    for n, i in enumerate(disconnectedSections):
+        segments.append({
             'state': 'tripped',
-            'loads': gs.findLoadPoints(i, loads),
+            'loads': segmentLoads[n],
+            'peakLoad': peakLoads[n],
             'time': gs.switchingTime(i, switchingTimes)
         })
 
     # Reconnect protection devices and update the system state
-    buses, sections = gs.reconnectProtection(buses, sections, trippedProtection, fault)
-
-    #print('buses after reconnection:', buses)  # Debugging line
-    #print('sections after reconnection:', sections)  # Debugging line
+    tp.setOpenEnds(zone['reconnectedUpstream'], zone['reconnectedDownstream'], topology)
 
     # Identify disconnected sections again after reconnection
-    disconnectedSections = []
-    disconnectedSections = gs.findConnectedSegments(buses, sections)
+    labels, disconnectedSections = gs.labelSegments(topology)
+    segmentLoads = gs.segmentLoadPoints(labels, len(disconnectedSections), topology)
+    aggregates = gs.segmentAggregates(labels, len(disconnectedSections), topology)
+    peakLoads = gs.segmentPeakLoads(labels, len(disconnectedSections), topology)
+    energized = gs.energizedBuses(topology)
+    faultSegments = [labels[bus] for bus in (tp.upstreamBus(fault, topology), tp.downstreamBus(fault, topology)) if bus != tp.NO_BUS]
+
+    for n, i in enumerate(disconnectedSections):
+        if n in faultSegments:
+            # Faulted section
+            segments.append({'state': 'fault', 'loads': segmentLoads[n], 'peakLoad': peakLoads[n]})
+        elif energized[i[0]]:
+            # Section connected to the main power source
+            segments.append({'state': 'connected', 'loads': segmentLoads[n], 'peakLoad': peakLoads[n]})
+        else: # Section not connected to the main power source or to the fault, records the backup feeders that can supply it
+            connectedBackup = gs.findBackupFeeders(i, topology)
+            feeders = []
+            for j in connectedBackup:
+                if j['otherEnd'] != tp.NO_BUS and energized[j['otherEnd']]: #checks if the backup feeder is connected to the main power source on the opposite end
+                    backupLoads = None
+                    backupPeakLoad = 0
+                    breaker = gs.findProtection(j['otherEnd'], topology)
+                    if DSEBF and breaker is not None: #Down Stream Effect of Backup Feeder
+                        if breaker['direction'] == 'D':
+                            endBus = tp.upstreamBus(breaker['section'], topology)
+                        else:
+                            endBus = breaker['bus']
+                        connected = gs.connectedBetween(j['otherEnd'], endBus, topology)
+                        backupLoads = gs.findBusLoadPoints(connected, topology)
+                        backupPeakLoad = gs.busesPeakLoad(connected, topology)
+                    feeders.append({'s': topology['backupFeederS'][j['backupFeeder']], 'backupLoads': backupLoads, 'backupPeakLoad': backupPeakLoad})
+            segments.append({
+                'state': 'unsupplied',
+                'loads': segmentLoads[n],
+                'peakLoad': peakLoads[n],
+                'DERCapacity': gs.segmentDERCapacity(i, topology),
+                'buses': gs.busLabels(i, topology),
+                'aggregates': {key: aggregates[key][n] for key in aggregates},
+                'hasBackupFeeders': len(connectedBackup) > 0,
+                'feeders': feeders
+            })
 
-    #print('disconnected sections after reconnection:', disconnectedSections)  # Debugging line
+    return {'fullSystemDown': False, 's': s, 'segments': segments}
 
-    for i in disconnectedSections:
-        if sections['Upstream Bus'][fault] in i or sections['Downstream Bus'][fault] in i:
-            # Faulted section
+def resolveFaultOutcome(outcome, r, DERS=False):
+    """
+    Finds the effects on the segments of a fault with a given duration from the structural outcome of the fault.
+
+    Args:
+        outcome (dict): The outcome of the fault from faultOutcome.
+        r (int): The fault duration.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+
+    Returns:
+        list: Effects on the segments (state, load points and outage time).
+    """
+    effectsOnSections = []
+
+    if outcome['fullSystemDown']:
+        effectsOnSections.append({
+            'state': 'fullSystemDown',
+            'loads': outcome['loads'],
+            'time': r
+        })
+        return effectsOnSections
+
+    s = outcome['s']
+    r = max(r, s)  # Ensure r is at least as long as the maximum switching time (mostly to avoid errors from negative values)
+
+    for i in outcome['segments']:
+        if i['state'] == 'tripped':
+            effectsOnSections.append({
+                'state': 'tripped',
+                'loads': i['loads'],
+                'time': i['time']
+            })
+        elif i['state'] == 'fault':
             effectsOnSections.append({
                 'state': 'fault',
-                'loads': gs.findLoadPoints(i, loads),
+                'loads': i['loads'],
                 'time': r
             })
-        elif gs.mainPower(i[0], buses, sections, generationData):
-            # Section connected to the main power source
+        elif i['state'] == 'connected':
             effectsOnSections.append({
                 'state': 'connected',
-                'loads': gs.findLoadPoints(i, loads),
+                'loads': i['loads'],
                 'time': 0
             })
         else: # Section not connected to the main power source or to the fault, checks for any type of backup power
             if DERS:
-                uBackup = gf.distributedGeneration(loads, generationData, i, r, s) #Calculates the outage duration after local generation is utilized
+                uBackup = gf.segmentDistributedGeneration(i['aggregates'], r, s) #Calculates the outage duration after local generation is utilized
             else:
                 uBackup = r
             # Check for backup feeders
-            connectedBackup = gs.findBackupFeeders(i, backupFeeders)
-            if connectedBackup:
-                for j in connectedBackup:
-                    if gs.mainPower(j['otherEnd'], buses, sections, generationData): #checks if the backup feeder is connected to the main power source on the opposite end
-                        if backupFeeders.at[j['backupFeeder'], 's'] < uBackup:
-                            breaker = gs.findProtection(j['otherEnd'], buses, sections)
+            if i['hasBackupFeeders']:
+                for j in i['feeders']:
+                    if j['s'] < uBackup:
+                        effectsOnSections.append({
+                            'state': 'backupPower',
+                            'loads': i['loads'],
+                            'time': j['s']
+                        })
+                        if j['backupLoads'] is not None: #Down Stream Effect of Backup Feeder
                             effectsOnSections.append({
-                                'state': 'backupPower',
-                                'loads': gs.findLoadPoints(i, loads),
-                                'time': backupFeeders['s'][j['backupFeeder']]
-                            })
-                            if DSEBF: #Down Stream Effect of Backup Feeder
-                                if breaker['direction'] == 'D':
-                                    endBus = sections['Upstream Bus'][breaker['section']]
-                                else:
-                                    endBus = breaker['bus']
-                                connected = gs.connectedBetween(j['otherEnd'], endBus, buses, sections, connected=[])
-                                effectsOnSections.append({
-                                    'state': 'backup',
-                                    'loads': gs.findLoadPoints(connected, loads),
-                                    'time': s
-                                })
-                        elif DERS:
-                            # If DERS are enabled and are prefferential to BF, use local generation
-                            effectsOnSections.append({
-                                'state': 'localGenerationOverBF',
-                                'loads': gs.findLoadPoints(i, loads),
-                                'time': uBackup
+                                'state': 'backup',
+                                'loads': j['backupLoads'],
+                                'time': s
                             })
+                    elif DERS:
+                        # If DERS are enabled and are prefferential to BF, use local generation
+                        effectsOnSections.append({
+                            'state': 'localGenerationOverBF',
+                            'loads': i['loads'],
+                            'time': uBackup
+                        })
             elif DERS and uBackup < r:
                 # If no backup feeder is available, use local generation
                 effectsOnSections.append({
                     'state': 'localGeneration',
-                    'loads': gs.findLoadPoints(i, loads),
+                    'loads': i['loads'],
                     'time': uBackup
                 })
             else:
                 # No backup feeder available
                 effectsOnSections.append({
                     'state': 'noBackup',
-                    'loads': gs.findLoadPoints(i, loads),
+                    'loads': i['loads'],
                     'time': r
                 })
 
-    #print('Effects on sections:', effectsOnSections) #Intermediat debugging line
-    
-
-
-    # Aggregate the effects on load points
-    effectsOnLPs = {}
-    for i in effectsOnSections:
-        for LP in i['loads']:
-            if LP in effectsOnLPs:
-                if i['time'] is None:
-                    i['time'] = 0
-                elif i['time'] > effectsOnLPs[LP]:
-                    effectsOnLPs[LP] = i['time']
-            else:
-                if i['time'] is None:
-                    effectsOnLPs[LP] = 0
-                else:
-                    effectsOnLPs[LP] = i['time']
-
-    # Return the final effects on load points
-
-
-
-    if createFIM:
-        return effectsOnLPs, effectsOnSections
-    else:
-        return effectsOnLPs
+    return effectsOnSections
@@ -0,0 +1,119 @@
+import heapq
+import numpy as np
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def createComponents(sections):
+    """
+    Numbers the components in the order of the sections and their components and collects their failure data in
+    arrays, done once per simulation since the failure data do not change between the years.
+
+    Args:
+        sections (DataFrame): Data about sections in the system (with the failure data in 'Components').
+
+    Returns:
+        dict: The components.
+            sec/comp: section and component of each component number
+            l/r: failure rate and repair time of each component
+    """
+    sec = []
+    comp = []
+    l = []
+    r = []
+    for i in sections.index:
+        for j in sections['Components'][i]:
+            sec.append(i)
+            comp.append(j)
+            l.append(sections['Components'][i][j]['lambda'])
+            r.append(sections['Components'][i][j]['r'])
+    return {
+        'sec': sec,
+        'comp': comp,
+        'l': np.array(l, dtype=np.float64),
+        'r': np.array(r, dtype=np.float64)
+    }
+
+
+def createScheduler(components):
+    """
+    Creates an event scheduler for the failures of all components in the system, with an empty failure history. The
+    component data are shared with the components from createComponents and are not changed by the scheduler.
+
+    Args:
+        components (dict): The components from createComponents.
+
+    Returns:
+        dict: The scheduler.
+            sec/comp/l/r: the component data (see createComponents)
+            TTF/TTR: time to the next failure and the repair time of that failure for each component
+            queue: heap of (TTF, component number)
+    """
+    return {
+        'sec': components['sec'],
+        'comp': components['comp'],
+        'l': components['l'],
+        'r': components['r'],
+        'TTF': np.zeros(len(components['sec']), dtype=np.float64),
+        'TTR': np.zeros(len(components['sec']), dtype=np.float64),
+        'queue': []
+    }
+
+
+def schedule(scheduler, component, TTF, TTR):
+    """
+    Adds the first failure of a component to the scheduler.
+
+    Args:
+        scheduler (dict): The scheduler (is updated).
+        component (int): The component number.
+        TTF (float): Time of the failure.
+        TTR (float): Repair time of the failure.
+    """
+    scheduler['TTF'][component] = TTF
+    scheduler['TTR'][component] = TTR
+    heapq.heappush(scheduler['queue'], (TTF, component))
+
+
+def nextFailure(scheduler):
+    """
+    Finds the next component to fail. Components failing at the same time are returned in the order of their numbers.
+
+    Args:
+        scheduler (dict): The scheduler.
+
+    Returns:
+        int: The component number.
+    """
+    return scheduler['queue'][0][1]
+
+
+def reschedule(scheduler, component, TTF, TTR):
+    """
+    Moves the next failure of the component from nextFailure to a new time, after the repair of the current failure.
+
+    Args:
+        scheduler (dict): The scheduler (is updated).
+        component (int): The component number, must be the one returned by nextFailure.
+        TTF (float): Time of the new failure.
+        TTR (float): Repair time of the new failure.
+    """
+    scheduler['TTF'][component] = TTF
+    scheduler['TTR'][component] = TTR
+    heapq.heapreplace(scheduler['queue'], (TTF, component))
@@ -20,41 +20,23 @@ RELRAD-software, general software for reliability studies of radial power system
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
-def distributedGeneration(loads, generationData, connection, r, s):
+def segmentDistributedGeneration(aggregates, r, s):
     """
-    Calculates the outage duration considering local distributed generation resources.
-    
+    Calculates the outage duration considering local distributed generation resources, from the load and generation
+    of a segment summed in advance (see GraphSearch.segmentAggregates).
+
     Args:
-        loads (DataFrame): Load point data including peak and average power demands
-        generationData (DataFrame): Generation sources data including power limits and energy capacity
-        connection (list): List of connected nodes (loads and generators)
+        aggregates (dict): Peak and average load, generation, constant generation and storage capacity of the segment
         r (float): Total repair time in hours
         s (float): Switching time in hours
-    
+
     Returns:
         float: Updated outage duration after considering distributed generation
     """
-    # Initialize power and energy variables
-    powerAvailable = 0    # Total power available from generators
-    energyStorage = 0     # Total energy storage capacity
-    powerNeeded = 0       # Total peak power demand
-    energyNeeded = 0      # Total energy demand during outage
-
-    # Calculate available resources and needed power/energy
-    for i in connection:
-        if i in generationData.index:
-            # Handle generators without storage
-            if generationData['Lim MW'][i] > 0 and generationData['E cap'][i] == 0:
-                powerAvailable += generationData['Lim MW'][i]
-                energyNeeded -= generationData['Lim MW'][i] * (r-s)  # Subtract constant generation
-            # Handle generators with storage
-            elif generationData['Lim MW'][i] > 0 and generationData['E cap'][i] > 0:
-                energyStorage += generationData['E cap'][i]
-                powerAvailable += generationData['Lim MW'][i]
-        # Calculate load requirements
-        if i in loads.index:
-            powerNeeded += loads['Load point peak [MW]'][i]
-            energyNeeded += loads['Load level average [MW]'][i] * (r-s)
+    powerAvailable = aggregates['generation']    # Total power available from generators
+    energyStorage = aggregates['storage']        # Total energy storage capacity
+    powerNeeded = aggregates['peakLoad']         # Total peak power demand
+    energyNeeded = (aggregates['averageLoad'] - aggregates['constantGeneration']) * (r-s)  # Energy demand minus constant generation
 
     # Determine outage duration based on available resources
     if energyStorage > energyNeeded and powerAvailable > powerNeeded:
@@ -67,32 +49,25 @@ def distributedGeneration(loads, generationData, connection, r, s):
         else:
             return r  # Full outage duration if insufficient resources
 
-def loadCurveDistributedGeneration(energyNeeded, powerNeeded, generationData, connection, r, s):
+def loadCurveSegmentDistributedGeneration(energyNeeded, powerNeeded, aggregates, r, s):
     """
-    Calculates outage duration using load curve data and distributed generation.
-    
+    Calculates outage duration using load curve data and distributed generation, from the generation of a segment
+    summed in advance (see GraphSearch.segmentAggregates).
+
     Args:
         energyNeeded (float): Total energy demand during outage [MWh]
         powerNeeded (float): Peak power demand [MW]
-        generationData (DataFrame): Generation sources data
-        connection (list): List of connected nodes
+        aggregates (dict): Generation, constant generation and storage capacity of the segment
         r (float): Repair time [hours]
         s (float): Switching time [hours]
-    
+
     Returns:
         float: Updated outage duration considering load curve and DG
     """
-    powerAvailable = 0
-    energyStorage = 0
+    powerAvailable = aggregates['generation']
+    energyStorage = aggregates['storage']
     energyNeeded = 0
-    for i in connection:
-        if i in generationData.index:
-            if generationData['Lim MW'][i] > 0 and generationData['E cap'][i] == 0:
-                powerAvailable += generationData['Lim MW'][i]
-                powerNeeded -= generationData['Lim MW'][i] * (r-s)
-            elif generationData['Lim MW'][i] > 0 and generationData['E cap'][i] > 0:
-                energyStorage += generationData['E cap'][i]
-                powerAvailable += generationData['Lim MW'][i]
+    powerNeeded -= aggregates['constantGeneration'] * (r-s)
 
 
     if energyStorage > energyNeeded and powerAvailable > powerNeeded:
@@ -170,7 +145,7 @@ def loadCurveDistributedGenerationNoPeak(energyNeeded, generationData, connectio
 
 
 
-def PV(t, Pr, R_c, G_std, G_max, LDI):
+def PV(t, Pr, R_c, G_std, G_max, LDI, generator=None):
     """
     Simulates photovoltaic (PV) power production based on time and environmental factors.
     Implementation based on Enevoldsen2021.
@@ -182,6 +157,7 @@ def PV(t, Pr, R_c, G_std, G_max, LDI):
         G_std (float): Standard radiation level
         G_max (float): Maximum radiation level
         LDI (list): Monthly light distribution index
+        generator (Generator, optional): NumPy random generator, the random module is used if None
     
     Returns:
         float: PV power production [MW]
@@ -201,7 +177,10 @@ def PV(t, Pr, R_c, G_std, G_max, LDI):
     hour = np.ceil(hour) if (hour-np.floor(hour)) >= 0.0001 else np.round(hour)
 
     # Calculate solar radiation based on time of day
-    f = rng.uniform(0, 1)  # Random factor for radiation variation
+    if generator is None:
+        f = rng.uniform(0, 1)  # Random factor for radiation variation
+    else:
+        f = generator.uniform(0, 1)
     if hour >= 6 and hour < 18:  # Daylight hours
         # Parabolic radiation curve during day
         G_d = G_max*((-1/36*hour)**2 + 2/(3*hour) - 3)
@@ -1,4 +1,5 @@
-import pandas as pd
+import numpy as np
+import Topology as tp
 
 '''
 RELRAD-software, general software for reliability studies of radial power systems
@@ -18,459 +19,660 @@ RELRAD-software, general software for reliability studies of radial power system
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
+# All functions work on the compiled topology from Topology.py, buses and sections are given by their number.
+# The topology arrays are never changed, the section ends disconnected during the analysis of a fault are recorded
+# in a topology overlay (see Topology.createOverlay) and read through Topology.upstreamBus/downstreamBus.
+
+def connectedSections(bus, topology):
+    """
+    Finds the sections that are connected to a bus (the sections where the end at the bus is not disconnected).
+
+    Args:
+        bus (int): The bus.
+        topology (dict): The compiled topology.
+
+    Returns:
+        list: List of tuples (section, bus at the other end of the section).
+    """
+    upstreamBus = topology['upstreamBus']
+    downstreamBus = topology['downstreamBus']
+    openUpstream = topology['openUpstream']
+    openDownstream = topology['openDownstream']
+    sections = []
+    for i in topology['adjacency'][topology['adjacencyPtr'][bus]:topology['adjacencyPtr'][bus + 1]]:
+        up = tp.NO_BUS if i in openUpstream else upstreamBus[i]
+        down = tp.NO_BUS if i in openDownstream else downstreamBus[i]
+        if up == bus:
+            sections.append((i, down))
+        elif down == bus:
+            sections.append((i, up))
+    return sections
+
+def upstreamSection(bus, topology):
+    """
+    Finds the upstream section of a bus, if it is still connected to the bus.
+
+    Args:
+        bus (int): The bus.
+        topology (dict): The compiled topology.
+
+    Returns:
+        int: The upstream section, or NO_BUS if there is none.
+    """
+    section = topology['upstreamSection'][bus]
+    if section == tp.NO_BUS or tp.downstreamBus(section, topology) != bus:
+        return tp.NO_BUS
+    return section
+
 # Function to simulate the tripping of protection devices based on a fault
-def tripProtection(fault, buses, sections):
+def tripProtection(fault, topology):
     """
     Simulates the tripping of protection devices based on a fault.
 
     Args:
         fault (int): The faulted section.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): Topology overlay of the compiled topology (is updated).
 
     Returns:
-        tuple: Updated buses, sections, tripped protection details, and failure status.
+        tuple: Updated topology, tripped protection details, and failure status.
     """
+    protection = topology['protection']
     section = fault
     # Check if the faulted section has upstream or bidirectional protection
-    if sections['Fuse/breaker direction'][section] in ['U', 'B']:
-        # Trip the upstream protection and update the buses and sections
+    if protection[section] in (tp.UPSTREAM, tp.BOTH):
+        # Trip the upstream protection and update the topology
         trippedProtection = {
             'section': section,
-            'bus': sections['Upstream Bus'][section],
+            'bus': tp.upstreamBus(section, topology),
             'direction': 'U'
         }
-        buses['Downstream Sections'][sections['Upstream Bus'][section]].remove(section)
-        sections['Upstream Bus'][section] = 0
-        return buses, sections, trippedProtection, False
+        tp.openUpstream(section, topology)
+        return topology, trippedProtection, False
 
     # Move to the upstream section to find protection
-    section = buses['Upstream Section'][sections['Upstream Bus'][section]]
+    section = upstreamSection(tp.upstreamBus(section, topology), topology)
     while True:
-        if section == 0:
+        if section == tp.NO_BUS:
             # If no protection is found, return failure
-            return 0, 0, 0, True
-        if sections['Fuse/breaker direction'][section] != 'N':
+            return 0, 0, True
+        if protection[section] != tp.NONE:
             # Check if the section has downstream or bidirectional protection
-            if sections['Fuse/breaker direction'][section] in ['D', 'B']:
+            if protection[section] in (tp.DOWNSTREAM, tp.BOTH):
                 trippedProtection = {
                     'section': section,
-                    'bus': sections['Downstream Bus'][section],
+                    'bus': tp.downstreamBus(section, topology),
                     'direction': 'D'
                 }
-                # Update buses and sections after tripping downstream protection
-                buses['Upstream Section'][sections['Downstream Bus'][section]] = 0
-                buses['Connected Sections'][sections['Downstream Bus'][section]].remove(section)
-                sections['Downstream Bus'][section] = 0
-                return buses, sections, trippedProtection, False
+                # Update the topology after tripping downstream protection
+                tp.openDownstream(section, topology)
+                return topology, trippedProtection, False
             else:
                 # Trip upstream protection
                 trippedProtection = {
                     'section': section,
-                    'bus': sections['Upstream Bus'][section],
+                    'bus': tp.upstreamBus(section, topology),
                     'direction': 'U'
                 }
-                buses['Downstream Sections'][sections['Upstream Bus'][section]].remove(section)
-                buses['Connected Sections'][sections['Upstream Bus'][section]].remove(section)
-                sections['Upstream Bus'][section] = 0
-                return buses, sections, trippedProtection, False
+                tp.openUpstream(section, topology)
+                return topology, trippedProtection, False
         else:
             # Continue searching upstream for protection
-            section = buses['Upstream Section'][sections['Upstream Bus'][section]]
+            section = upstreamSection(tp.upstreamBus(section, topology), topology)
 
-def findProtection(bus, buses, sections):
+def findProtection(bus, topology):
     """
-    Finds the protection device for a given bus.
+    Finds the protection device for a given bus. If there is no protection between the bus and the top of the feeder,
+    the feeder breaker at the top bus is the protection (on the upstream end of the last section).
 
     Args:
         bus (int): The bus to find protection for.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): The compiled topology.
 
     Returns:
-        dict: Details of the protection device.
+        dict: Details of the protection device (the section is NO_BUS if the bus is the top of the feeder), or None if
+            the upstream bus of a section is missing.
     """
-    section = buses['Upstream Section'][bus]
-    if sections['Fuse/breaker direction'][section] in ['U', 'B']:
-        protection = {'section': section, 'bus': sections['Upstream Bus'][section], 'direction': 'U'}
-        return protection
-    else:
-        section = buses['Upstream Section'][sections['Upstream Bus'][section]]
+    protection = topology['protection']
+    section = upstreamSection(bus, topology)
+    if section == tp.NO_BUS:
+        return {'section': tp.NO_BUS, 'bus': bus, 'direction': 'U'}
+    if protection[section] in (tp.UPSTREAM, tp.BOTH):
+        return {'section': section, 'bus': tp.upstreamBus(section, topology), 'direction': 'U'}
     while True:
-        if sections['Fuse/breaker direction'][section] != 'N':
-            if sections['Fuse/breaker direction'][section] in ['D', 'B']:
-                protection = {'section': section, 'bus': sections['Downstream Bus'][section], 'direction': 'D'}
-                return protection
+        upperBus = tp.upstreamBus(section, topology)
+        if upperBus == tp.NO_BUS:
+            return None
+        upperSection = upstreamSection(upperBus, topology)
+        if upperSection == tp.NO_BUS:
+            return {'section': section, 'bus': upperBus, 'direction': 'U'}
+        section = upperSection
+        if protection[section] != tp.NONE:
+            if protection[section] in (tp.DOWNSTREAM, tp.BOTH):
+                return {'section': section, 'bus': tp.downstreamBus(section, topology), 'direction': 'D'}
             else:
-                protection = {'section': section, 'bus': sections['Upstream Bus'][section], 'direction': 'U'}
-                return protection
-        else:
-            section = buses['Upstream Section'][sections['Upstream Bus'][section]]
+                return {'section': section, 'bus': tp.upstreamBus(section, topology), 'direction': 'U'}
 
-def DFS(bus, buses, sections, connected=[]):
+def DFS(bus, topology):
     """
     Depth First Search (DFS) to find all connected buses.
 
     Args:
         bus (int): The starting bus.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
-        connected (list, optional): List of already connected buses. Defaults to [].
+        topology (dict): The compiled topology.
 
     Returns:
-        list: List of connected buses.
-    """
-    if bus in connected:
-        return connected
-    if bus != 0:
-        connected.append(bus)
-    for i in buses['Connected Sections'][bus]:
-        if i == 0:
-            return connected
-        if sections['Upstream Bus'][i] == bus:
-            nextBus = sections['Downstream Bus'][i]
+        list: List of connected buses, in the order they are found.
+    """
+    visited = bytearray(len(topology['busLabels']))
+    visited[bus] = 1
+    connected = [bus]
+    stack = [iter(connectedSections(bus, topology))]
+    while stack:
+        for i, nextBus in stack[-1]:
+            if nextBus != tp.NO_BUS and not visited[nextBus]:
+                visited[nextBus] = 1
+                connected.append(nextBus)
+                stack.append(iter(connectedSections(nextBus, topology)))
+                break
         else:
-            nextBus = sections['Upstream Bus'][i]
-        if nextBus == 0:
-            continue
-        if nextBus not in connected:
-            connected = DFS(nextBus, buses, sections, connected)
+            stack.pop()
     return connected
 
-def connectedBetween(startBus, endBus, buses, sections, connected=[]):
+def connectedBetween(startBus, endBus, topology):
     """
     Finds all buses connected between two given buses.
 
     Args:
         startBus (int): The starting bus.
         endBus (int): The ending bus.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
-        connected (list, optional): List of already connected buses. Defaults to [].
+        topology (dict): The compiled topology.
 
     Returns:
         list: List of connected buses between startBus and endBus.
     """
-    if startBus in connected:
-        return connected
-    connected.append(startBus)
-    for i in buses['Connected Sections'][startBus]:
-        if i == 0:
-            return connected
-        if sections['Upstream Bus'][i] == startBus:
-            nextBus = sections['Downstream Bus'][i]
+    visited = bytearray(len(topology['busLabels']))
+    visited[startBus] = 1
+    connected = [startBus]
+    stack = [iter(connectedSections(startBus, topology))]
+    while stack:
+        for i, nextBus in stack[-1]:
+            if nextBus != tp.NO_BUS and nextBus != endBus and not visited[nextBus]:
+                visited[nextBus] = 1
+                connected.append(nextBus)
+                stack.append(iter(connectedSections(nextBus, topology)))
+                break
         else:
-            nextBus = sections['Upstream Bus'][i]
-        if nextBus == 0:
-            continue
-        if nextBus == endBus:
-            continue
-        if nextBus not in connected:
-            connected = connectedBetween(nextBus, endBus, buses, sections, connected)
+            stack.pop()
     return connected
 
-def disconnectorsDFS(bus, buses, sections, connected=[], disconnectors=[]):
+def disconnectorsDFS(bus, topology):
     """
     Depth First Search (DFS) to find all disconnectors.
 
     Args:
         bus (int): The starting bus.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
-        connected (list, optional): List of already connected buses. Defaults to [].
-        disconnectors (list, optional): List of already found disconnectors. Defaults to [].
+        topology (dict): The compiled topology.
 
     Returns:
         list: List of disconnectors.
     """
-    if bus in connected:
-        return disconnectors
-    if bus != 0:
-        connected.append(bus)
-    for i in buses['Connected Sections'][bus]:
-        if i == 0:
-            continue
+    disconnector = topology['disconnector']
+    disconnectors = []
+    visited = bytearray(len(topology['busLabels']))
+    visited[bus] = 1
+    stack = [(bus, iter(connectedSections(bus, topology)))]
+    while stack:
+        fromBus, sections = stack[-1]
+        for i, nextBus in sections:
+            if disconnector[i] != tp.NONE:
+                disconnectors.append({
+                    'line': i,
+                    'fromBus': fromBus,
+                    's': topology['s'][i],
+                    'toBus': nextBus
+                })
+                continue
 
-        if sections['Disconnector direction'][i] != 'N':
-            disconnectors.append({
-                'line': i,
-                'fromBus': bus,
-                's': sections['s'][i],
-                'toBus': sections['Downstream Bus'][i] if sections['Upstream Bus'][i] == bus else sections['Upstream Bus'][i]
-            })
-            continue
+            if nextBus == tp.NO_BUS:
+                continue
 
-        if sections['Upstream Bus'][i] == bus:
-            nextBus = sections['Downstream Bus'][i]
+            if not visited[nextBus]:
+                visited[nextBus] = 1
+                stack.append((nextBus, iter(connectedSections(nextBus, topology))))
+                break
         else:
-            nextBus = sections['Upstream Bus'][i]
-
-        if nextBus == 0:
-            continue
-
-        if nextBus not in connected:
-            disconnectors = disconnectorsDFS(nextBus, buses, sections, connected, disconnectors)
+            stack.pop()
     return disconnectors
 
-def disconnect(fault, buses, sections):
+def disconnect(fault, topology):
     """
     Disconnects sections based on a fault.
 
     Args:
         fault (int): The faulted section.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): Topology overlay of the compiled topology (is updated).
 
     Returns:
-        tuple: Updated buses, sections, and list of disconnectors.
+        tuple: Updated topology and list of disconnectors.
     """
-    if sections['Disconnector direction'][fault] == 'B':
-        faultBus = 0
-        disconnectors = []
+    disconnector = topology['disconnector']
+    s = topology['s']
+    disconnectors = []
+    if disconnector[fault] == tp.BOTH:
+        faultBus = tp.NO_BUS
         disconnectors.append({
                 'line': fault,
-                'fromBus': sections['Upstream Bus'][fault],
-                's': sections['s'][fault],
-                'toBus': sections['Downstream Bus'][fault]
+                'fromBus': tp.upstreamBus(fault, topology),
+                's': s[fault],
+                'toBus': tp.downstreamBus(fault, topology)
             })
         disconnectors.append({
                 'line': fault,
-                'fromBus': sections['Downstream Bus'][fault],
-                's': sections['s'][fault],
-                'toBus': sections['Upstream Bus'][fault]
+                'fromBus': tp.downstreamBus(fault, topology),
+                's': s[fault],
+                'toBus': tp.upstreamBus(fault, topology)
             })
-    elif sections['Disconnector direction'][fault] == 'D' and sections['Upstream Bus'][fault] == 0:
-        faultBus = 0
-        disconnectors = []
+    elif disconnector[fault] == tp.DOWNSTREAM and tp.upstreamBus(fault, topology) == tp.NO_BUS:
+        faultBus = tp.NO_BUS
         disconnectors.append({
                 'line': fault,
-                'fromBus': sections['Downstream Bus'][fault],
-                's': sections['s'][fault],
-                'toBus': sections['Upstream Bus'][fault]
+                'fromBus': tp.downstreamBus(fault, topology),
+                's': s[fault],
+                'toBus': tp.upstreamBus(fault, topology)
             })
-    elif sections['Disconnector direction'][fault] == 'U':
-        faultBus = sections['Downstream Bus'][fault]
-    elif sections['Disconnector direction'][fault] == 'D':
-        faultBus = sections['Upstream Bus'][fault]
+    elif disconnector[fault] == tp.UPSTREAM:
+        faultBus = tp.downstreamBus(fault, topology)
+    elif disconnector[fault] == tp.DOWNSTREAM:
+        faultBus = tp.upstreamBus(fault, topology)
     else:
-        faultBus = sections['Downstream Bus'][fault]
-        if faultBus == 0:
-            faultBus = sections['Upstream Bus'][fault]
-    if faultBus != 0:
-        disconnectors = disconnectorsDFS(faultBus, buses, sections, connected=[], disconnectors=[])
+        faultBus = tp.downstreamBus(fault, topology)
+        if faultBus == tp.NO_BUS:
+            faultBus = tp.upstreamBus(fault, topology)
+    if faultBus != tp.NO_BUS:
+        disconnectors = disconnectorsDFS(faultBus, topology)
 
-    openDisconnectors = []
+    # Open the disconnectors, at the end of the line facing the fault
     for i in disconnectors:
-        if i['fromBus'] == sections['Upstream Bus'][i['line']]:
-            if sections['Disconnector direction'][i['line']] in ['D', 'B']:
-                openDisconnectors.append({'section': i['line'], 'direction': 'D'})
-                buses['Upstream Section'][sections['Downstream Bus'][i['line']]] = 0
-                if i['line'] in buses['Connected Sections'][sections['Downstream Bus'][i['line']]]:
-                    buses['Connected Sections'][sections['Downstream Bus'][i['line']]].remove(i['line'])
-                sections['Downstream Bus'][i['line']] = 0
+        line = i['line']
+        if i['fromBus'] == tp.upstreamBus(line, topology):
+            if disconnector[line] in (tp.DOWNSTREAM, tp.BOTH):
+                tp.openDownstream(line, topology)
             else:
-                openDisconnectors.append({'section': i['line'], 'direction': 'U'})
-                if i['line'] in buses['Downstream Sections'][sections['Upstream Bus'][i['line']]]:
-                    buses['Downstream Sections'][sections['Upstream Bus'][i['line']]].remove(i['line'])
-                if i['line'] in buses['Connected Sections'][sections['Upstream Bus'][i['line']]]:
-                    buses['Connected Sections'][sections['Upstream Bus'][i['line']]].remove(i['line'])
-                sections['Upstream Bus'][i['line']] = 0
+                tp.openUpstream(line, topology)
         else:
-            if sections['Disconnector direction'][i['line']] in ['U', 'B']:
-                openDisconnectors.append({'section': i['line'], 'direction': 'U'})
-                if i['line'] in buses['Downstream Sections'][sections['Upstream Bus'][i['line']]]:
-                    buses['Downstream Sections'][sections['Upstream Bus'][i['line']]].remove(i['line'])
-                if i['line'] in buses['Connected Sections'][sections['Upstream Bus'][i['line']]]:
-                    buses['Connected Sections'][sections['Upstream Bus'][i['line']]].remove(i['line'])
-                sections['Upstream Bus'][i['line']] = 0
+            if disconnector[line] in (tp.UPSTREAM, tp.BOTH):
+                tp.openUpstream(line, topology)
             else:
-                openDisconnectors.append({'section': i['line'], 'direction': 'D'})
-                buses['Upstream Section'][sections['Downstream Bus'][i['line']]] = 0
-                if i['line'] in buses['Connected Sections'][sections['Downstream Bus'][i['line']]]:
-                    buses['Connected Sections'][sections['Downstream Bus'][i['line']]].remove(i['line'])
-                sections['Downstream Bus'][i['line']] = 0
+                tp.openDownstream(line, topology)
 
-    return buses, sections, disconnectors
+    return topology, disconnectors
 
-def protectionNeededTestDFS(bus, buses, sections, protection, connected, needed):
+def protectionNeededTestDFS(bus, topology, protection):
     """
     Depth First Search (DFS) to test if protection is needed.
 
     Args:
         bus (int): The starting bus.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): The compiled topology.
         protection (dict): Details of the protection device.
-        connected (list): List of already connected buses.
-        needed (bool): Flag indicating if protection is needed.
 
     Returns:
         bool: True if protection is needed, False otherwise.
     """
-    if bus in connected:
-        return needed
-    connected.append(bus)
-    if bus == protection['bus']:
-        needed = True
-        return needed
-    for i in buses['Connected Sections'][bus]:
-        if i == protection['section']:
-            needed = True
-            return needed
-        if i == 0:
-            return needed
-        if sections['Upstream Bus'][i] == bus:
-            nextBus = sections['Downstream Bus'][i]
-        else:
-            nextBus = sections['Upstream Bus'][i]
-        if nextBus == 0:
-            continue
-        if nextBus not in connected:
-            needed = protectionNeededTestDFS(nextBus, buses, sections, protection, connected, needed)
-    return needed
-
-def reconnectProtection(buses, sections, trippedProtection, fault):
+    visited = bytearray(len(topology['busLabels']))
+    visited[bus] = 1
+    stack = [bus]
+    while stack:
+        bus = stack.pop()
+        if bus == protection['bus']:
+            return True
+        for i, nextBus in connectedSections(bus, topology):
+            if i == protection['section']:
+                return True
+            if nextBus == tp.NO_BUS:
+                continue
+            if not visited[nextBus]:
+                visited[nextBus] = 1
+                stack.append(nextBus)
+    return False
+
+def reconnectProtection(topology, trippedProtection, fault):
     """
     Reconnects protection devices after a fault.
 
     Args:
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): Topology overlay of the compiled topology (is updated).
         trippedProtection (dict): Details of the tripped protection device.
         fault (int): The faulted section.
 
     Returns:
-        tuple: Updated buses and sections.
-    """
-    if sections['Upstream Bus'][fault] != 0:
-        if protectionNeededTestDFS(sections['Upstream Bus'][fault], buses, sections, trippedProtection, connected=[], needed=False):
-            return buses, sections
-    elif sections['Downstream Bus'][fault] != 0:
-        if protectionNeededTestDFS(sections['Downstream Bus'][fault], buses, sections, trippedProtection, connected=[], needed=False):
-            return buses, sections
+        dict: Updated topology.
+    """
+    if tp.upstreamBus(fault, topology) != tp.NO_BUS:
+        if protectionNeededTestDFS(tp.upstreamBus(fault, topology), topology, trippedProtection):
+            return topology
+    elif tp.downstreamBus(fault, topology) != tp.NO_BUS:
+        if protectionNeededTestDFS(tp.downstreamBus(fault, topology), topology, trippedProtection):
+            return topology
     if trippedProtection['direction'] == 'U':
-        sections.loc[trippedProtection['section'], 'Upstream Bus'] = trippedProtection['bus']
-        buses['Downstream Sections'][trippedProtection['bus']].append(trippedProtection['section'])
-        buses['Connected Sections'][trippedProtection['bus']].append(trippedProtection['section'])
+        tp.closeUpstream(trippedProtection['section'], topology)
     else:
-        sections.loc[trippedProtection['section'], 'Downstream Bus'] = trippedProtection['bus']
-        buses['Upstream Section'][trippedProtection['bus']] = trippedProtection['section']
-        buses['Connected Sections'][trippedProtection['bus']].append(trippedProtection['section'])
-    return buses, sections
+        tp.closeDownstream(trippedProtection['section'], topology)
+    return topology
 
-def findLPbetweenBusAndProtection(bus, buses, sections):
+def compileFaultZones(topology):
     """
-    Finds the load points between a bus and its protection device.
+    Precomputes the protection zone and disconnector zone of every section, i.e. the fault handling that only
+    depends on the topology. The graph searches for the tripping of the protection, the disconnection of the fault
+    and the reconnection of the protection are done once here, and the analysis of a fault only applies the
+    disconnected section ends of each stage.
 
     Args:
-        bus (int): The starting bus.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): The compiled topology.
+
+    Returns:
+        list: Fault zone of each section (see faultZone).
     """
-    section = buses['Upstream Section'][bus]
-    while True:
-        if sections['Fuse/breaker direction'][section] != 'N':
-            if sections['Fuse/breaker direction'][section] in ['D', 'B']:
-                bus = sections['Downstream Bus'][section]
+    return [faultZone(fault, topology) for fault in range(len(topology['sectionLabels']))]
+
+def faultZone(fault, topology):
+    """
+    Finds the protection zone and disconnector zone of a section.
+
+    Args:
+        fault (int): The faulted section.
+        topology (dict): The compiled topology.
+
+    Returns:
+        dict: The fault zone.
+            fullSystemDown: flag for faults that are not cleared by any protection (the only key in that case)
+            trippedProtection: details of the tripped protection device
+            trippedBuses: buses disconnected by the protection
+            disconnectors: list of disconnectors opened to isolate the fault
+            s: the maximum switching time of the disconnectors
+            switchingTimes: maximum switching time of the disconnectors at each bus
+            isolatedUpstream/isolatedDownstream: disconnected section ends with the protection tripped and the
+                disconnectors opened
+            reconnectedUpstream/reconnectedDownstream: disconnected section ends after the protection is reconnected
+            isolatedBuses: buses isolated with the faulted section after the protection is reconnected
+    """
+    overlay = tp.createOverlay(topology)
+    overlay, trippedProtection, fullSystemDown = tripProtection(fault, overlay)
+    if fullSystemDown:
+        return {'fullSystemDown': True}
+
+    if trippedProtection['direction'] == 'U':
+        trippedBus = tp.downstreamBus(trippedProtection['section'], overlay)
+    else:
+        trippedBus = trippedProtection['bus']
+    trippedBuses = DFS(trippedBus, overlay) if trippedBus != tp.NO_BUS else []
+
+    overlay, disconnectors = disconnect(fault, overlay)
+    s = 0
+    switchingTimes = {}
+    for i in disconnectors:
+        s = max(s, i['s'])
+        for bus in (i['fromBus'], i['toBus']):
+            if bus not in switchingTimes or i['s'] > switchingTimes[bus]:
+                switchingTimes[bus] = i['s']
+    isolatedUpstream = frozenset(overlay['openUpstream'])
+    isolatedDownstream = frozenset(overlay['openDownstream'])
+
+    overlay = reconnectProtection(overlay, trippedProtection, fault)
+    isolatedBuses = []
+    for bus in (tp.upstreamBus(fault, overlay), tp.downstreamBus(fault, overlay)):
+        if bus != tp.NO_BUS and bus not in isolatedBuses:
+            isolatedBuses += DFS(bus, overlay)
+
+    return {
+        'fullSystemDown': False,
+        'trippedProtection': trippedProtection,
+        'trippedBuses': trippedBuses,
+        'disconnectors': disconnectors,
+        's': s,
+        'switchingTimes': switchingTimes,
+        'isolatedUpstream': isolatedUpstream,
+        'isolatedDownstream': isolatedDownstream,
+        'reconnectedUpstream': frozenset(overlay['openUpstream']),
+        'reconnectedDownstream': frozenset(overlay['openDownstream']),
+        'isolatedBuses': isolatedBuses
+    }
+
+def labelSegments(topology):
+    """
+    Labels the connected segments of the system in one pass over the buses.
+
+    Args:
+        topology (dict): The compiled topology.
+
+    Returns:
+        tuple: Segment number of each bus (array), and the buses of each segment (lists, in the order they are found).
+    """
+    nrBuses = len(topology['busLabels'])
+    labels = [tp.NO_BUS] * nrBuses
+    segments = []
+    for j in range(nrBuses):
+        if labels[j] != tp.NO_BUS:
+            continue
+        segment = len(segments)
+        labels[j] = segment
+        connected = [j]
+        stack = [iter(connectedSections(j, topology))]
+        while stack:
+            for i, nextBus in stack[-1]:
+                if nextBus != tp.NO_BUS and labels[nextBus] == tp.NO_BUS:
+                    labels[nextBus] = segment
+                    connected.append(nextBus)
+                    stack.append(iter(connectedSections(nextBus, topology)))
+                    break
             else:
-                bus = sections['Upstream Bus'][section]
-        else:
-            section = buses['Upstream Section'][sections['Upstream Bus'][section]]
+                stack.pop()
+        segments.append(connected)
+    return np.array(labels, dtype=np.int32), segments
+
+def segmentLoadPoints(labels, nrSegments, topology):
+    """
+    Finds the load points in each segment.
+
+    Args:
+        labels (array): Segment number of each bus, from labelSegments.
+        nrSegments (int): Number of segments.
+        topology (dict): The compiled topology.
+
+    Returns:
+        list: List of load points of each segment (in the order of the loads).
+    """
+    loadLabels = topology['loadLabels']
+    loadPoints = [[] for i in range(nrSegments)]
+    for n, bus in enumerate(topology['loadBus']):
+        if bus != tp.NO_BUS:
+            loadPoints[labels[bus]].append(loadLabels[n])
+    return loadPoints
+
+def segmentPeakLoads(labels, nrSegments, topology):
+    """
+    Sums the peak load of the load points in each segment, in the order of the loads (the same sums as adding the
+    'Load point peak [MW]' of the load points of each segment one by one).
+
+    Args:
+        labels (array): Segment number of each bus, from labelSegments.
+        nrSegments (int): Number of segments.
+        topology (dict): The compiled topology.
+
+    Returns:
+        list: Peak load of each segment.
+    """
+    busPeakLoad = topology['busPeakLoad']
+    peakLoads = [0] * nrSegments
+    for bus in topology['loadBus']:
+        if bus != tp.NO_BUS:
+            peakLoads[labels[bus]] += busPeakLoad[bus]
+    return peakLoads
+
+def busesPeakLoad(buses, topology):
+    """
+    Sums the peak load of the load points on a list of buses, in the order of the loads.
+
+    Args:
+        buses (list): List of bus numbers.
+        topology (dict): The compiled topology.
+
+    Returns:
+        float: The peak load.
+    """
+    busLoad = topology['busLoad']
+    peakLoad = 0
+    for bus in sorted(buses, key=lambda bus: busLoad[bus]):
+        if busLoad[bus] != tp.NO_BUS:
+            peakLoad += topology['busPeakLoad'][bus]
+    return peakLoad
+
+def segmentDERCapacity(buses, topology):
+    """
+    Sums the distributed generation and storage of the buses in a segment, in the order of the buses.
+
+    Args:
+        buses (list): List of bus numbers in the segment.
+        topology (dict): The compiled topology.
 
-def findConnectedSegments(buses, sections):
+    Returns:
+        dict: Power of the generators without storage ('localGeneration'), and energy and power of the storage
+            ('energyStorage' and 'storagePower').
+    """
+    localGeneration = 0
+    energyStorage = 0
+    storagePower = 0
+    for bus in buses:
+        if topology['busConstantGeneration'][bus] > 0:
+            localGeneration += topology['busConstantGeneration'][bus]
+        elif topology['busStorage'][bus] > 0:
+            energyStorage += topology['busStorage'][bus]
+            storagePower += topology['busGeneration'][bus]
+    return {'localGeneration': localGeneration, 'energyStorage': energyStorage, 'storagePower': storagePower}
+
+def segmentAggregates(labels, nrSegments, topology):
+    """
+    Sums the loads and generation of the buses in each segment.
+
+    Args:
+        labels (array): Segment number of each bus, from labelSegments.
+        nrSegments (int): Number of segments.
+        topology (dict): The compiled topology.
+
+    Returns:
+        dict: Arrays with the number of customers, peak load, average load, generation, constant generation
+            (generators without storage) and storage capacity of each segment.
     """
-    Finds all connected segments in the system.
+    aggregates = {}
+    for key, busKey in (('customers', 'busCustomers'), ('peakLoad', 'busPeakLoad'), ('averageLoad', 'busAverageLoad'),
+                        ('generation', 'busGeneration'), ('constantGeneration', 'busConstantGeneration'), ('storage', 'busStorage')):
+        aggregates[key] = np.bincount(labels, weights=topology[busKey], minlength=nrSegments)
+    return aggregates
+
+def findBusLoadPoints(buses, topology):
+    """
+    Finds the load points on a list of buses.
 
     Args:
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        buses (list): List of bus numbers.
+        topology (dict): The compiled topology.
 
     Returns:
-        list: List of connected segments.
-    """
-    nrFound = 0
-    found = []
-    connections = []
-    connected = []
-    while nrFound < len(buses):
-        for j, row in buses.iterrows():
-            if j not in found:
-                connected = []
-                connected = DFS(j, buses, sections, connected=[])
-                connections.append(connected.copy())
-                for n in connected:
-                    nrFound += 1
-                    found.append(n)
-    return connections
-
-def findBackupFeeders(connections, backupFeeders):
+        list: List of load points (in the order of the loads).
+    """
+    busLoad = topology['busLoad']
+    loadLabels = topology['loadLabels']
+    return [loadLabels[n] for n in sorted(busLoad[bus] for bus in buses if busLoad[bus] != tp.NO_BUS)]
+
+def findBackupFeeders(connections, topology):
     """
     Finds backup feeders for connected segments.
 
     Args:
-        connections (list): List of connected segments.
-        backupFeeders (DataFrame): Data about backup feeders in the system.
+        connections (list): List of buses in a connected segment.
+        topology (dict): The compiled topology.
 
     Returns:
         list: List of connections with backup feeders.
     """
+    busBackupFeederPtr = topology['busBackupFeederPtr']
+    busBackupFeeders = topology['busBackupFeeders']
+    backupFeederEnds = topology['backupFeederEnds']
     conectionsWithBackup = []
     for i in connections:
-        for n, row in backupFeeders.iterrows():
-            if i == backupFeeders['End 1'][n] or i == backupFeeders['End 2'][n]:
-                bus = i
-                backupFeeder = n
-                if i == backupFeeders['End 1'][n]:
-                    otherEnd = backupFeeders['End 2'][n]
-                else:
-                    otherEnd = backupFeeders['End 1'][n]
-                conectionsWithBackup.append({
-                    'bus': bus,
-                    'backupFeeder': backupFeeder,
-                    'connection': connections,
-                    'otherEnd': otherEnd
-                })
+        for n in busBackupFeeders[busBackupFeederPtr[i]:busBackupFeederPtr[i + 1]]:
+            ends = backupFeederEnds[n]
+            if i == ends[0]:
+                otherEnd = ends[1]
+            else:
+                otherEnd = ends[0]
+            conectionsWithBackup.append({
+                'bus': i,
+                'backupFeeder': n,
+                'connection': connections,
+                'otherEnd': otherEnd
+            })
     return conectionsWithBackup
 
-def mainPower(bus, buses, sections, generationData):
+def energizedBuses(topology):
+    """
+    Finds the buses connected to the main power feeder in one pass from the top of the feeders, gives the same
+    result as mainPower for every bus.
+
+    Args:
+        topology (dict): The compiled topology.
+
+    Returns:
+        array: Flag for the buses connected to the main power feeder.
+    """
+    upstreamBus = topology['upstreamBus']
+    upstreamSection = topology['upstreamSection']
+    openUpstream = topology['openUpstream']
+    openDownstream = topology['openDownstream']
+    energized = topology['mainFeeder'].tolist()
+    for bus in topology['busOrder'].tolist():
+        if not energized[bus]:
+            section = upstreamSection[bus]
+            if section != tp.NO_BUS and section not in openUpstream and section not in openDownstream:
+                energized[bus] = upstreamBus[section] != tp.NO_BUS and energized[upstreamBus[section]]
+    return np.array(energized, dtype=bool)
+
+def mainPower(bus, topology):
     """
     Checks if a bus is connected to the main power feeder.
 
     Args:
         bus (int): The bus to check.
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
-        generationData (DataFrame): Data about generation in the system.
+        topology (dict): The compiled topology.
 
     Returns:
         bool: True if the bus is connected to the main power feeder, False otherwise.
     """
+    if bus == tp.NO_BUS:
+        return False
     while True:
-        if bus in generationData.index:
-            if generationData['Main Feeder'][bus]:
-                return True
-        if buses['Upstream Section'][bus] == 0:
+        if topology['mainFeeder'][bus]:
+            return True
+        section = upstreamSection(bus, topology)
+        if section == tp.NO_BUS:
             return False
-        if sections['Upstream Bus'][buses['Upstream Section'][bus]] == 0:
+        if tp.upstreamBus(section, topology) == tp.NO_BUS:
             return False
-        bus = sections['Upstream Bus'][buses['Upstream Section'][bus]]
+        bus = tp.upstreamBus(section, topology)
 
-def findLoadPoints(connections, loads):
+def busLabels(connections, topology):
     """
-    Finds load points in connected segments.
+    Translates a list of bus numbers to the bus labels used in the DataFrames.
 
     Args:
-        connections (list): List of connected segments.
-        loads (DataFrame): Data about loads in the system.
+        connections (list): List of bus numbers.
+        topology (dict): The compiled topology.
 
     Returns:
-        list: List of load points.
+        list: List of bus labels.
     """
-    loadPoints = []
-    for i, row in loads.iterrows():
-        if i in connections:
-            loadPoints.append(i)
-    return loadPoints
+    labels = topology['busLabels']
+    return [labels[i] for i in connections]
 
 def switchingTime(connectedSections, switchingTimes):
     """
@@ -486,8 +688,3 @@ def switchingTime(connectedSections, switchingTimes):
     for i in connectedSections:
         if i in switchingTimes:
             return switchingTimes[i]
-
-
-
-
-
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+import os
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# States of the Failure Impact Matrix (FIM) and their integer codes, 0 is an empty cell
+STATES = ['', 'F', '0', 'M', 'B', 'N']
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+# Size limits of an Excel sheet, the FIM sheet has a header row and an index column, larger FIMs have to be written in
+# long format with writeColumns
+MAX_SHEET_ROWS = 1048576
+MAX_SHEET_COLUMNS = 16384
+
+
+def createImpactMatrix(sections, loads):
+    """
+    Creates an empty sparse Failure Impact Matrix (FIM), only the cells that are set are stored, as integer codes.
+
+    Args:
+        sections (list): Labels of the sections (rows).
+        loads (list): Labels of the load points (columns).
+
+    Returns:
+        dict: The FIM.
+            sections/loads: row and column labels, sectionIndex/loadIndex: label to number
+            rows/columns/codes: the cells in the order they are set, a later cell replaces an earlier one
+    """
+    return {
+        'sections': list(sections),
+        'loads': list(loads),
+        'sectionIndex': {sec: i for i, sec in enumerate(sections)},
+        'loadIndex': {LP: i for i, LP in enumerate(loads)},
+        'rows': [],
+        'columns': [],
+        'codes': []
+    }
+
+
+def setStates(matrix, sec, states):
+    """
+    Sets the states of the load points for a fault in a section.
+
+    Args:
+        matrix (dict): The FIM (is updated).
+        sec (str): The section.
+        states (dict): State ('F', '0', 'M', 'B' or 'N') of each load point.
+    """
+    row = matrix['sectionIndex'][sec]
+    loadIndex = matrix['loadIndex']
+    for LP in states:
+        matrix['rows'].append(row)
+        matrix['columns'].append(loadIndex[LP])
+        matrix['codes'].append(STATE_CODES[states[LP]])
+
+
+def cells(matrix):
+    """
+    Finds the cells of the FIM that are set, with the last state set in each cell.
+
+    Args:
+        matrix (dict): The FIM.
+
+    Returns:
+        tuple: Arrays with the row, column and state code of the cells, ordered by row and column.
+    """
+    rows = np.array(matrix['rows'], dtype=np.int64)
+    columns = np.array(matrix['columns'], dtype=np.int64)
+    codes = np.array(matrix['codes'], dtype=np.int8)
+    keys = rows * len(matrix['loads']) + columns
+    # The first occurrence of each cell in the reversed order is the last one set
+    keys, last = np.unique(keys[::-1], return_index=True)
+    last = len(rows) - 1 - last
+    return rows[last], columns[last], codes[last]
+
+
+def checkSheetSize(matrix):
+    """
+    Checks that the FIM fits in an Excel sheet (see toDataFrame), with a row for each section and a column for each
+    load point.
+
+    Args:
+        matrix (dict): The FIM.
+
+    Raises:
+        ValueError: If the FIM has more rows or columns than an Excel sheet.
+    """
+    if len(matrix['sections']) + 1 > MAX_SHEET_ROWS or len(matrix['loads']) + 1 > MAX_SHEET_COLUMNS:
+        raise ValueError('The FIM (%d sections, %d load points) does not fit in the FIM sheet (max %d sections, %d load points), give a .parquet or .csv FIMFile to write it in long format'
+                         % (len(matrix['sections']), len(matrix['loads']), MAX_SHEET_ROWS - 1, MAX_SHEET_COLUMNS - 1))
+
+def toDataFrame(matrix):
+    """
+    Creates the dense FIM with the sections as rows and the load points as columns, the empty cells are NaN.
+
+    Args:
+        matrix (dict): The FIM.
+
+    Returns:
+        DataFrame: The FIM.
+    """
+    rows, columns, codes = cells(matrix)
+    dense = np.zeros((len(matrix['sections']), len(matrix['loads'])), dtype=np.int8)
+    dense[rows, columns] = codes
+    labels = np.array([np.nan] + STATES[1:], dtype=object)
+    return pd.DataFrame(labels[dense], index=matrix['sections'], columns=matrix['loads'])
+
+
+def toColumns(matrix):
+    """
+    Creates the FIM in long format, with one row per cell that is set.
+
+    Args:
+        matrix (dict): The FIM.
+
+    Returns:
+        DataFrame: Columns 'Section', 'Load point' and 'State' (categorical).
+    """
+    rows, columns, codes = cells(matrix)
+    return pd.DataFrame({
+        'Section': pd.Categorical.from_codes(rows, categories=matrix['sections']),
+        'Load point': pd.Categorical.from_codes(columns, categories=matrix['loads']),
+        'State': pd.Categorical.from_codes(codes - 1, categories=STATES[1:])
+    })
+
+
+def writeColumns(matrix, file):
+    """
+    Writes the FIM in long format (see toColumns) to a Parquet file (needs pyarrow or fastparquet) or a CSV file.
+
+    Args:
+        matrix (dict): The FIM.
+        file (str): Location of the output file, the format is given by the extension '.parquet' or '.csv'.
+    """
+    extension = os.path.splitext(file)[1].lower()
+    if extension == '.parquet':
+        toColumns(matrix).to_parquet(file, index=False)
+    elif extension == '.csv':
+        toColumns(matrix).to_csv(file, index=False)
+    else:
+        raise ValueError('Unknown FIM file format %s, use .parquet or .csv' % extension)
@@ -1,5 +1,7 @@
 import numpy as np
 import pandas as pd
+import hashlib
+import os
 import random as rng
 
 '''
@@ -20,205 +22,535 @@ RELRAD-software, general software for reliability studies of radial power system
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
-def createLoadCurve(loadCurveData):
-    loadCurve = []
-    for t in range(1, 8737):
-        week = t/(8736/52)
-        day = (week-np.floor(week))*7
-        hour = (day-np.floor(day))*24
-
-        if day == 0:
-            day = 7
-
-        if hour == 0 or round(hour) == 0:
-            hour = 24
-        
-        # Rounding to the nearest upper integer
-        week = int(np.ceil(week))
-        day = int(np.ceil(day))
-        if (hour-np.floor(hour)) < 0.0001:
-            hour = int(np.round(hour))
-        else:
-            hour = int(np.ceil(hour))
-
-
-        if day == 6 or day == 7: #weekend
-            if week >= 1 and week <= 8: # Winter
-                hourlyfactor = 'Winter Wknd'
-            elif week >= 9 and week <= 17: # Spring
-                hourlyfactor = 'Spring/Fall Wknd'
-            elif week >= 18 and week <= 30: # Summer
-                hourlyfactor = 'Summer Wknd'
-            elif week >= 31 and week <= 43: # Fall
-                hourlyfactor = 'Spring/Fall Wknd'
-            else: # Winter
-                hourlyfactor = 'Winter Wknd'
-        
-        else: # weekday
-            if week >= 1 and week <= 8: # Winter
-                hourlyfactor = 'Winter Wkdy'
-            elif week >= 9 and week <= 17: # Spring
-                hourlyfactor = 'Spring/Fall Wkdy'
-            elif week >= 18 and week <= 30: # Summer
-                hourlyfactor = 'Summer Wkdy'
-            elif week >= 31 and week <= 43: # Fall
-                hourlyfactor = 'Spring/Fall Wkdy'
-            else: # Winter
-                hourlyfactor = 'Winter Wkdy'
- 
-        loadCurve.append(loadCurveData['weeklyFactor'].at[week, 'Load Factor']/100 * loadCurveData['dailyFactor'].at[day, 'Load Factor']/100 * loadCurveData['hourlyFactor'].at[hour, hourlyfactor]/100) # (Factors are given in %.)
-    loadCurve.append(0) #failure prevention
-    loadCurve.append(0)
-    return loadCurve
+# Load curves built in this process, by the content of their factor tables
+loadCurveCache = {}
 
 
+def createLoadCurve(loadCurveData):
+    """
+    Creates the load curve of the year from the weekly, daily and hourly load factors. The curve is built once for
+    each set of factor tables in a process, later calls with tables of the same content return the same (read-only)
+    curve.
+
+    Args:
+        loadCurveData (dict): The 'weeklyFactor', 'dailyFactor' and 'hourlyFactor' tables from CreateSystem.createSystem.
+
+    Returns:
+        array: The load factor of each hour of the year (8736 hours), followed by two zeros.
+    """
+    key = loadCurveKey(loadCurveData)
+    if key not in loadCurveCache:
+        loadCurve = buildLoadCurve(loadCurveData)
+        loadCurve.setflags(write=False)
+        loadCurveCache[key] = loadCurve
+    return loadCurveCache[key]
+
+
+def loadCurveKey(loadCurveData):
+    """
+    Finds the key of a set of factor tables in the load curve cache, from the content of the tables.
+
+    Args:
+        loadCurveData (dict): The factor tables.
+
+    Returns:
+        str: The key.
+    """
+    digest = hashlib.sha256()
+    for name in ('weeklyFactor', 'dailyFactor', 'hourlyFactor'):
+        table = loadCurveData[name]
+        digest.update(repr((name, list(table.index), list(table.columns), [str(dtype) for dtype in table.dtypes])).encode())
+        digest.update(np.ascontiguousarray(table.to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def buildLoadCurve(loadCurveData):
+    """
+    Builds the load curve from the factor tables for all hours at once (see createLoadCurve).
+
+    Args:
+        loadCurveData (dict): The factor tables.
+
+    Returns:
+        array: The load curve.
+    """
+    t = np.arange(1, 8737, dtype=np.float64)
+    week = t/(8736/52)
+    day = (week-np.floor(week))*7
+    hour = (day-np.floor(day))*24
+
+    day[day == 0] = 7
+    hour[(hour == 0) | (np.round(hour) == 0)] = 24
+
+    # Rounding to the nearest upper integer
+    week = np.ceil(week).astype(np.int64)
+    day = np.ceil(day).astype(np.int64)
+    hour = np.where(hour-np.floor(hour) < 0.0001, np.round(hour), np.ceil(hour)).astype(np.int64)
+
+    # Winter (week 1-8 and 44-52), spring (9-17), summer (18-30) and fall (31-43), weekend on day 6 and 7
+    season = np.where((week >= 18) & (week <= 30), 'Summer', np.where(((week >= 9) & (week <= 17)) | ((week >= 31) & (week <= 43)), 'Spring/Fall', 'Winter'))
+    hourlyfactor = np.char.add(season, np.where((day == 6) | (day == 7), ' Wknd', ' Wkdy'))
+
+    hourlyFactor = loadCurveData['hourlyFactor']
+    columns = hourlyFactor.columns.get_indexer(hourlyfactor)
+    if (columns < 0).any():
+        raise KeyError('Missing hourly load factor %s' % hourlyfactor[columns < 0][0])
+    weekly = loadCurveData['weeklyFactor']['Load Factor'].loc[week].to_numpy(dtype=np.float64)
+    daily = loadCurveData['dailyFactor']['Load Factor'].loc[day].to_numpy(dtype=np.float64)
+    hourly = hourlyFactor.loc[hour].to_numpy(dtype=np.float64)[np.arange(len(t)), columns]
+
+    loadCurve = np.zeros(len(t) + 2, dtype=np.float64) # two zeros at the end for failure prevention
+    loadCurve[:len(t)] = weekly/100 * daily/100 * hourly/100 # (Factors are given in %.)
+    return loadCurve
 
-def loadCurveSumEnergy(t, r, loadList, loads, loadCurve):
 
+def createLoadCurveIndex(loadCurve):
+    """
+    Creates the index of a load curve, built once per load curve so the energy and the peak load of an outage are found
+    without a loop over the hours of the outage.
+
+    Args:
+        loadCurve (array): The load curve from createLoadCurve.
+
+    Returns:
+        dict: The index.
+            curve: the load curve over the 8736 hours of the year
+            energy: cumulative energy of the load curve per MW peak load, energy[h] is the energy of the hours before hour h
+            peak: sparse table of the load curve maximum, peak[k][h] is the maximum of the 2**k hours from hour h
+    """
+    curve = np.asarray(loadCurve, dtype=np.float64)[:8736]
+    energy = np.zeros(len(curve) + 1, dtype=np.float64)
+    np.cumsum(curve, out=energy[1:])
+    peak = [curve]
+    while 2 ** len(peak) <= len(curve):
+        half = 2 ** (len(peak) - 1)
+        peak.append(np.maximum(peak[-1][:-half], peak[-1][half:]))
+    return {'curve': curve, 'energy': energy, 'peak': peak}
+
+
+def cumulativeEnergy(t, loadCurveIndex):
+    """
+    Finds the energy of the load curve per MW peak load from the start of the year to a time, nothing is added after
+    the end of the year.
+
+    Args:
+        t (float): The time.
+        loadCurveIndex (dict): The index from createLoadCurveIndex.
+
+    Returns:
+        float: The energy in MWh per MW peak load.
+    """
+    curve = loadCurveIndex['curve']
+    hour = int(np.floor(t))
+    if hour >= len(curve):
+        return loadCurveIndex['energy'][-1]
+    return loadCurveIndex['energy'][hour] + (t - hour) * curve[hour]
+
+
+def sumEnergy(t, r, peakLoad, loadCurveIndex):
+    """
+    Finds the energy not supplied to a load during an outage from the cumulative energy of the load curve.
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        peakLoad (float): The peak load of the load points in MW.
+        loadCurveIndex (dict): The index from createLoadCurveIndex.
+
+    Returns:
+        float: The energy in MWh.
+    """
     if r is None:
         return 0
+    return (cumulativeEnergy(t + r, loadCurveIndex) - cumulativeEnergy(t, loadCurveIndex)) * peakLoad
 
-    peakLoad = 0
-    for load in loadList:
-        peakLoad += loads['Load point peak [MW]'][load] # Peak load in MW
-
-    E = 0
-    
-    #creates a list of the length of time the load is in each of the load curve points
-    # The first element is the time from t to the next full hour, the last element is the time from the last full hour to r
-    timeList = []
-    timeList.append(min(1-t%1, r))
-    for i in range(int(np.floor(r-min(1-t%1, r)))):
-        timeList.append(1)
-    timeList.append(min((r-(1-t%1))%1, (r-min(1-t%1, r))%1))
 
+def intervalPeak(t, r, peakLoad, loadCurveIndex):
+    """
+    Finds the peak demand of a load during an outage from the maximum of the load curve over the hours of the outage
+    (including the hour the outage ends in).
 
-    for i in range(len(timeList)):
-        timePoint = int(np.floor(t+i))
-        if timePoint >= 8736:
-            return E
-        E += timeList[i] * loadCurve[timePoint] * peakLoad # Energy in MWh
-        
-    return E
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        peakLoad (float): The peak load of the load points in MW.
+        loadCurveIndex (dict): The index from createLoadCurveIndex.
 
-
-def randomGenerationCurve():
+    Returns:
+        float: The peak demand in MW.
+    """
+    if r is None:
+        return 0
+    first = int(np.floor(t))
+    last = min(first + max(int(np.floor(r - 1 + t % 1)), 0) + 1, len(loadCurveIndex['curve']) - 1)
+    if first > last:
+        return 0
+    k = (last - first + 1).bit_length() - 1
+    table = loadCurveIndex['peak'][k]
+    return max(max(table[first], table[last - 2 ** k + 1]) * peakLoad, 0)
+
+
+def createLoadProfiles(loads, profiles, loadClass=None, loadCurve=None):
+    """
+    Creates the profile matrix of the load points from profiles of each load point or of each class of load points
+    (e.g. residential, commercial and industrial).
+
+    Args:
+        loads (DataFrame): Data about loads in the system.
+        profiles (dict): The profile of each load point, or of each class if loadClass is given. A profile is the
+            load per unit of the load point peak in each time step.
+        loadClass (dict, optional): The class of each load point. Defaults to None.
+        loadCurve (array, optional): The profile of the load points without a profile or class, e.g. the load curve
+            from createLoadCurve (only the first 8736 hours are used). Defaults to None.
+
+    Returns:
+        array: The profiles (float32, load points x time steps, in the order of the loads).
+    """
+    rows = []
+    for LP in loads.index:
+        key = LP if loadClass is None else loadClass.get(LP)
+        if key in profiles:
+            rows.append(np.asarray(profiles[key], dtype=np.float32))
+        elif loadCurve is not None:
+            rows.append(np.asarray(loadCurve[:8736], dtype=np.float32))
+        else:
+            raise KeyError('No load profile for load point %s' % LP)
+    if len({len(row) for row in rows}) > 1:
+        raise ValueError('The load profiles must have the same number of time steps')
+    return np.array(rows, dtype=np.float32).reshape(len(rows), -1)
+
+
+def profileEnergyFile(file):
+    """
+    Finds the location of the cumulative energy file of a load profile file.
+
+    Args:
+        file (str): Location of the load profile file (.npy).
+
+    Returns:
+        str: Location of the cumulative energy file.
+    """
+    return os.path.splitext(file)[0] + '.energy.npy'
+
+
+def writeLoadProfiles(profiles, file, blockSize=256):
+    """
+    Writes a profile matrix to a .npy file that can be memory-mapped, together with the cumulative energy of each
+    profile (see profileEnergyFile). The cumulative energy is written in blocks of load points.
+
+    Args:
+        profiles (array): The profiles from createLoadProfiles.
+        file (str): Location of the load profile file, must end with '.npy'.
+        blockSize (int, optional): Number of load points in each block. Defaults to 256.
+    """
+    if os.path.splitext(file)[1].lower() != '.npy':
+        raise ValueError('Unknown load profile file format %s, use .npy' % os.path.splitext(file)[1])
+    profiles = np.asarray(profiles, dtype=np.float32)
+    np.save(file, profiles)
+    energy = np.lib.format.open_memmap(profileEnergyFile(file), mode='w+', dtype=np.float64, shape=(profiles.shape[0], profiles.shape[1] + 1))
+    for start in range(0, profiles.shape[0], blockSize):
+        block = slice(start, start + blockSize)
+        energy[block, 0] = 0
+        np.cumsum(profiles[block], axis=1, dtype=np.float64, out=energy[block, 1:])
+    energy.flush()
+    del energy
+
+
+def openLoadProfiles(file, loads, step=1):
+    """
+    Opens a load profile file from writeLoadProfiles as memory-mapped arrays, the profiles are read from the file
+    when they are used instead of being copied into every process.
+
+    Args:
+        file (str): Location of the load profile file.
+        loads (DataFrame): Data about loads in the system (the load points of the rows).
+        step (float, optional): Length of the time steps of the profiles in hours. Defaults to 1.
+
+    Returns:
+        dict: The load profile index (see createProfileIndex).
+    """
+    profiles = np.load(file, mmap_mode='r')
+    energy = np.load(profileEnergyFile(file), mmap_mode='r')
+    return createProfileIndex(profiles, loads, step=step, energy=energy)
+
+
+def createProfileIndex(profiles, loads, step=1, energy=None):
+    """
+    Creates the index of a profile matrix, used in place of the load curve index for the energy and peak demand of
+    the outages (see outageEnergy and outagePeak).
+
+    Args:
+        profiles (array): The profiles from createLoadProfiles (or memory-mapped from openLoadProfiles).
+        loads (DataFrame): Data about loads in the system (the load points of the rows).
+        step (float, optional): Length of the time steps of the profiles in hours. Defaults to 1.
+        energy (array, optional): The cumulative energy of the profiles, found from the profiles if not given. Defaults to None.
+
+    Returns:
+        dict: The index.
+            profiles: the profiles (load points x time steps)
+            energy: cumulative energy of each profile in time steps, energy[n, k] is the energy of the steps before step k
+            step: length of the time steps in hours
+            rows: row of each load point
+            peakLoad: peak load of the load point of each row in MW
+    """
+    if profiles.shape[0] != len(loads.index):
+        raise ValueError('The load profiles have %d rows for %d load points' % (profiles.shape[0], len(loads.index)))
+    if energy is None:
+        energy = np.zeros((profiles.shape[0], profiles.shape[1] + 1), dtype=np.float64)
+        np.cumsum(profiles, axis=1, dtype=np.float64, out=energy[:, 1:])
+    return {
+        'profiles': profiles,
+        'energy': energy,
+        'step': step,
+        'rows': {LP: n for n, LP in enumerate(loads.index)},
+        'peakLoad': loads['Load point peak [MW]'].to_numpy(dtype=np.float64)
+    }
+
+
+def profileCumulativeEnergy(t, rows, profileIndex):
+    """
+    Finds the energy of some profiles per MW peak load from the start of the profiles to a time, nothing is added after
+    the end of the profiles.
+
+    Args:
+        t (float): The time in hours.
+        rows (list): Rows of the profiles.
+        profileIndex (dict): The index from createProfileIndex.
+
+    Returns:
+        array: The energy in MWh per MW peak load of each row.
+    """
+    step = profileIndex['step']
+    k = int(np.floor(t / step))
+    if k >= profileIndex['profiles'].shape[1]:
+        return profileIndex['energy'][rows, -1] * step
+    return (profileIndex['energy'][rows, k] + (t / step - k) * profileIndex['profiles'][rows, k].astype(np.float64)) * step
+
+
+def profileSumEnergy(t, r, loadList, profileIndex):
+    """
+    Finds the energy not supplied to some load points with their own profiles during an outage.
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        loadList (list): The load points.
+        profileIndex (dict): The index from createProfileIndex.
+
+    Returns:
+        float: The energy in MWh.
+    """
+    if r is None or not loadList:
+        return 0
+    rows = [profileIndex['rows'][LP] for LP in loadList]
+    energy = profileCumulativeEnergy(t + r, rows, profileIndex) - profileCumulativeEnergy(t, rows, profileIndex)
+    return float(profileIndex['peakLoad'][rows] @ energy)
+
+
+def profilePeak(t, r, loadList, profileIndex):
+    """
+    Finds the peak demand of some load points with their own profiles during an outage, over the same time steps as
+    intervalPeak.
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        loadList (list): The load points.
+        profileIndex (dict): The index from createProfileIndex.
+
+    Returns:
+        float: The peak demand in MW.
+    """
+    if r is None or not loadList:
+        return 0
+    step = profileIndex['step']
+    first = int(np.floor(t / step))
+    last = min(first + max(int(np.floor((r - step) / step + (t / step) % 1)), 0) + 1, profileIndex['profiles'].shape[1] - 1)
+    if first > last:
+        return 0
+    rows = [profileIndex['rows'][LP] for LP in loadList]
+    return max(float((profileIndex['peakLoad'][rows] @ profileIndex['profiles'][rows, first:last + 1]).max()), 0)
+
+
+def outageEnergy(t, r, loadList, peakLoad, loadCurveIndex):
+    """
+    Finds the energy not supplied to some load points during an outage, from their own profiles if the index is a
+    load profile index, otherwise from the load curve and their summed peak load.
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        loadList (list): The load points.
+        peakLoad (float): The peak load of the load points in MW.
+        loadCurveIndex (dict): The index from createLoadCurveIndex or createProfileIndex.
+
+    Returns:
+        float: The energy in MWh.
+    """
+    if 'profiles' in loadCurveIndex:
+        return profileSumEnergy(t, r, loadList, loadCurveIndex)
+    return sumEnergy(t, r, peakLoad, loadCurveIndex)
+
+
+def outagePeak(t, r, loadList, peakLoad, loadCurveIndex):
+    """
+    Finds the peak demand of some load points during an outage, from their own profiles if the index is a load
+    profile index, otherwise from the load curve and their summed peak load.
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        loadList (list): The load points.
+        peakLoad (float): The peak load of the load points in MW.
+        loadCurveIndex (dict): The index from createLoadCurveIndex or createProfileIndex.
+
+    Returns:
+        float: The peak demand in MW.
+    """
+    if 'profiles' in loadCurveIndex:
+        return profilePeak(t, r, loadList, loadCurveIndex)
+    return intervalPeak(t, r, peakLoad, loadCurveIndex)
+
+
+def randomGenerationCurve(generator=None):
+    # Uses the NumPy Generator if one is given (for reproducible simulations), otherwise the random module
+    uniform = rng.uniform if generator is None else generator.uniform
     generationCurve = []
     for i in range(8738): # Flat generation curve, 1 for each hour of the year
-        generationCurve.append(rng.uniform(0, 2))
-    return generationCurve
+        generationCurve.append(uniform(0, 2))
+    return np.array(generationCurve, dtype=np.float64)
 
 
 
     
-def LCandDERScurve(t, r, s, loadList, loads, loadCurve, generationData, connection, generationCurve, storageCurve = None): 
-
-    storageCurve = generationCurve.copy() #uses the generation curve = storage curve for simple example
-
-
+def LCandDERScurve(t, r, s, loadList, loads, loadCurve, capacity, generationCurve, storageCurve = None): 
+    """
+    Finds the energy not supplied and the outage duration of a segment supplied by its local generation and storage
+    during an outage, with the hourly generation curve of the DERS (see DERSdispatch).
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        s (float): The switching time.
+        loadList (list): The load points of the segment.
+        loads (DataFrame): Data about loads in the system.
+        loadCurve (array): The load curve.
+        capacity (dict): The distributed generation and storage of the segment, from GraphSearch.segmentDERCapacity
+            (the 'DERCapacity' of the segment in EffectOfFault.faultOutcome).
+        generationCurve (list): The generation curve of the DERS.
+        storageCurve (list, optional): The state of charge curve of the storage, the generation curve is used if not given. Defaults to None.
+
+    Returns:
+        tuple: The energy not supplied and the outage duration.
+    """
     if r is None:
         return 0, 0
-    
 
     peakLoad = 0
     for load in loadList:
         peakLoad += loads['Load point peak [MW]'][load] # Peak load in MW
 
-    
-    ENS = 0
-    U = 0
+    return DERSdispatch(t, r, s, peakLoad, capacity, loadCurve, generationCurve, storageCurve)
+
+
+def outageHours(t, r):
+    """
+    Splits an outage in the hours of the load curve.
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration.
+
+    Returns:
+        tuple: The time in each hour (the first element is the time from t to the next full hour, the last element is
+            the time from the last full hour to the end of the outage) and the hour of each element.
+    """
+    first = min(1-t%1, r)
+    n = max(int(np.floor(r-first)), 0)
+    timeList = np.ones(n + 2, dtype=np.float64)
+    timeList[0] = first
+    timeList[-1] = min((r-(1-t%1))%1, (r-first)%1)
+    hours = np.floor(t + np.arange(n + 2)).astype(np.int64)
+    return timeList, hours
+
+
+def DERSdispatch(t, r, s, peakLoad, capacity, loadCurve, generationCurve, storageCurve = None):
+    """
+    Dispatches the local generation and storage of a segment against its load during an outage, for all hours at once.
+    The load is not supplied during the switching time. After that, in each hour the load is supplied by the local
+    generation alone, by the local generation and the storage (the storage is discharged), or not at all (the storage
+    is emptied if the hour starts with energy left in it). The storage starts with the state of charge of the hour the
+    outage starts in. The energy not supplied and the outage duration are summed in the order of the hours, so the
+    results are the same as with an hour-by-hour dispatch.
+
+    Args:
+        t (float): The start of the outage.
+        r (float): The outage duration (None for no outage).
+        s (float): The switching time.
+        peakLoad (float): The peak load of the segment in MW.
+        capacity (dict): The DER capacity of the segment from GraphSearch.segmentDERCapacity.
+        loadCurve (array): The load curve.
+        generationCurve (list): The generation curve of the DERS.
+        storageCurve (list, optional): The state of charge curve of the storage, the generation curve is used if not given. Defaults to None.
+
+    Returns:
+        tuple: The energy not supplied and the outage duration (at most r - s).
+    """
+    if r is None:
+        return 0, 0
+    if storageCurve is None:
+        storageCurve = generationCurve #uses the generation curve = storage curve for simple example
+    loadCurve = np.asarray(loadCurve)
+    generationCurve = np.asarray(generationCurve)
+
     #Calculates the ammount of energy not served during switchig
-    timeList = []
-    timeList.append(min(1-t%1, s))
-    for i in range(int(np.floor(s-min(1-t%1, s)))):
-        timeList.append(1)
-    timeList.append(min((s-(1-t%1))%1, (s-min(1-t%1, s))%1))
-
-    for i in range(len(timeList)):
-        timePoint = int(np.floor(t+i))
-        if timePoint >= 8736:
-            return ENS, U
-        ENS += timeList[i] * loadCurve[timePoint] * peakLoad
-        U += timeList[i]
+    switchingTime, switchingHours = outageHours(t, s)
+    switchingEnd = np.count_nonzero(switchingHours < 8736)
+    ENS = switchingTime[:switchingEnd] * loadCurve[switchingHours[:switchingEnd]] * peakLoad
+    U = switchingTime[:switchingEnd]
+    if switchingEnd < len(switchingHours):
+        return sumInOrder(ENS), sumInOrder(U)
     t += s
     r -= s
 
-
-    localGeneration = 0
-    energyStorage = 0
-    storagePower = 0
-    for i in connection:
-        if i in generationData.index:
-            if generationData['Lim MW'][i] > 0 and generationData['E cap'][i] == 0:
-                localGeneration += generationData['Lim MW'][i]
-            elif generationData['Lim MW'][i] > 0 and generationData['E cap'][i] > 0:
-                energyStorage += generationData['E cap'][i]
-                storagePower += generationData['Lim MW'][i]
-    
-    #creates a list of the length of time the load is in each of the load curve points
-    # The first element is the time from t to the next full hour, the last element is the time from the last full hour to r
-    timeList = []
-    timeList.append(min(1-t%1, r))
-    for i in range(int(np.floor(r-min(1-t%1, r)))):
-        timeList.append(1)
-    timeList.append(min((r-(1-t%1))%1, (r-min(1-t%1, r))%1))
-
-
-    storage = storageCurve[int(np.floor(t-s))] * energyStorage
-
-
-    for i in range(len(timeList)):
-        timePoint = int(np.floor(t+i))
-        if timePoint >= 8736:
-            U = min(r, U)
-            return ENS, U
-        if generationCurve[timePoint] * localGeneration > loadCurve[timePoint] * peakLoad:
-            ENS += 0 
-            U += 0
-            #print(1)
-        elif generationCurve[timePoint] * localGeneration *timeList[i] + storage > loadCurve[timePoint] * peakLoad * timeList[i] and generationCurve[timePoint] * localGeneration + storagePower > loadCurve[timePoint] * peakLoad:
-            storage -= loadCurve[timePoint] * peakLoad * timeList[i] - generationCurve[timePoint] * localGeneration * timeList[i]
-            ENS += 0
-            U += 0
-            #print(2)
-        elif generationCurve[timePoint] * localGeneration + storagePower > loadCurve[timePoint] * peakLoad and storage > 0:
-            storage = 0
-            ENS += loadCurve[timePoint] * peakLoad * timeList[i] - generationCurve[timePoint] * localGeneration * timeList[i] - storage
-            U += timeList[i] - timeList[i] * storage / (loadCurve[timePoint] * peakLoad * timeList[i] - generationCurve[timePoint] * localGeneration * timeList[i])
-            #print(3)
-        else:
-            ENS += timeList[i] * loadCurve[timePoint] * peakLoad
-            U += timeList[i]
-            #print(4)
-
-    U = min(r, U)
+    timeList, hours = outageHours(t, r)
+    hours = hours[:np.count_nonzero(hours < 8736)]
+    timeList = timeList[:len(hours)]
+    load = loadCurve[hours] * peakLoad
+    generation = generationCurve[hours] * capacity['localGeneration']
+    loadEnergy = load * timeList
+    generationEnergy = generation * timeList
+
+    # Hours not covered by the local generation alone that the storage has the power for, the storage is discharged in
+    # these hours until it can't supply the rest of an hour
+    covered = generation > load
+    storageHours = np.flatnonzero(~covered & (generation + capacity['storagePower'] > load))
+    storageNeeded = loadEnergy[storageHours] - generationEnergy[storageHours]
+    storage = np.subtract.accumulate(np.concatenate(([storageCurve[int(np.floor(t-s))] * capacity['energyStorage']], storageNeeded)))
+    supplied = generationEnergy[storageHours] + storage[:-1] > loadEnergy[storageHours]
+    nrSupplied = len(storageHours) if supplied.all() else int(np.argmin(supplied))
+
+    notSupplied = ~covered
+    notSupplied[storageHours[:nrSupplied]] = False
+    hourENS = timeList * loadCurve[hours] * peakLoad
+    if nrSupplied < len(storageHours) and storage[nrSupplied] > 0:
+        # The storage is emptied in the first hour it can't supply
+        hourENS[storageHours[nrSupplied]] = storageNeeded[nrSupplied]
+    ENS = sumInOrder(np.concatenate((ENS, hourENS[notSupplied])))
+    U = min(r, sumInOrder(np.concatenate((U, timeList[notSupplied]))))
     return ENS, U
 
 
+def sumInOrder(values):
+    """
+    Sums values one by one from the first to the last (as a loop, unlike the pairwise summation of np.sum).
 
+    Args:
+        values (array): The values.
 
-
-def loadPeak(t, r, loadList, loads, loadCurve):
-    if r is None:
+    Returns:
+        float: The sum (0 if there are no values).
+    """
+    if len(values) == 0:
         return 0
-
-    peakLoad = 0
-    for load in loadList:
-        peakLoad += loads['Load point peak [MW]'][load] # Peak load in MW
-    
-    #creates a list of the length of time the load is in each of the load curve points
-    # The first element is the time from t to the next full hour, the last element is the time from the last full hour to r
-    timeList = []
-    timeList.append(1-t%1)
-    for i in range(int(np.floor(r-1+t%1))):
-        timeList.append(1)
-    timeList.append((r-(1-t%1))%1)
-
-    P = 0
-    for i in range(len(timeList)):
-        timePoint = int(np.floor(t+i))
-        if timePoint >= 8736:
-            return P
-        if loadCurve[timePoint] * peakLoad > P:
-            P = loadCurve[timePoint] * peakLoad
-    return P
\ No newline at end of file
+    return np.add.accumulate(values)[-1]
@@ -1,6 +1,5 @@
-import pandas as pd
-import GraphSearch as gs
-import MiscFunctions as mf
+import numpy as np
+import EffectOfFault as ef
 import GenerationFunctions as gf
 import LoadCurve as lc
 
@@ -22,221 +21,209 @@ RELRAD-software, general software for reliability studies of radial power system
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
-def loadCurveFaultEffects(fault, component, buses, sections, loads, generationData, backupFeeders, t, r, loadCurve=0, DERScurve = 0, DSEBF = True, RNG=False, DERS = False):
+def loadCurveFaultEffects(fault, component, topology, loads, generationData, t, r, loadCurve=0, DERScurve = 0, DSEBF = True, DERS = False, faultCache=None, loadCurveIndex=None):
     """
     Calculates the effects of a fault on the system.
 
     Args:
-        fault (int): The faulted section.
+        fault (str): The faulted section.
         component (str): The component affected by the fault (not in use anymore).
-        buses (DataFrame): Data about buses in the system.
-        sections (DataFrame): Data about sections in the system.
+        topology (dict): Topology overlay of the compiled topology (is updated).
         loads (DataFrame): Data about loads in the system.
         generationData (DataFrame): Data about generation in the system.
-        backupFeeders (DataFrame): Data about backup feeders in the system.
+        t (float): The time of the fault.
         r (int): The fault duration.
         DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
-        RNG (bool, optional): Flag indicating if random number generation is used. Defaults to False.
+        faultCache (dict, optional): Fault cache from EffectOfFault.createFaultCache, the graph search is only done the first time a section fails. Defaults to None.
+        loadCurveIndex (dict, optional): Index of the load curve from LoadCurve.createLoadCurveIndex, or of the load profiles from LoadCurve.createProfileIndex, created from loadCurve if not given. Defaults to None.
 
     Returns:
         dict: Effects of the fault on load points.
     """
 
-    # Initialize a list to store the effects on sections
-    effectsOnSections = []
+    fault = topology['sectionIndex'][fault]
 
-    # Trip protection devices and check if the entire system is down
-    buses, sections, trippedProtection, fullSystemDown = gs.tripProtection(fault, buses, sections)
+    # Find the structural outcome of the fault, from the cache if it is available
+    if faultCache is not None:
+        key = (fault, DSEBF)
+        outcome = faultCache['outcomes'].get(key)
+        if outcome is None:
+            faultCache['misses'] += 1
+            outcome = ef.faultOutcome(fault, topology, loads, DSEBF)
+            faultCache['outcomes'][key] = outcome
+        else:
+            faultCache['hits'] += 1
+    else:
+        outcome = ef.faultOutcome(fault, topology, loads, DSEBF)
 
     # If the entire system is down, return fault duration for all load points
-    if fullSystemDown:
+    if outcome['fullSystemDown']:
         effectsOnLPs = {}
-        for i, row in loads.iterrows():
+        for i in outcome['loads']:
             effectsOnLPs[i] = r
         return effectsOnLPs
 
-    # Isolate the faulted section and identify disconnectors
-    buses, sections, disconnectors = gs.disconnect(fault, buses, sections)
+    # Find the outage time and energy not supplied of each segment for the fault
+    effectsOnSections = resolveLoadCurveFaultOutcome(outcome, loads, generationData, t, r, loadCurve, DERScurve, DERS, loadCurveIndex)
 
-    # Determine the maximum switching time among disconnectors
-    s = 0
-    for i in disconnectors:
-        if i['s'] > s:
-            s = i['s']
+    # Aggregate the effects on load points
+    ''''
+    ENS = 0
+    effectsOnLPs = {}
+    for LP in loads.index:
+        LPeffects = {'U': 0, 'ENS': 0}
+        effectsOnLPs[LP] = LPeffects
+    for sec in effectsOnSections:
+        ENS += sec['ENS']
+        for LP in sec['loads']:
+            if sec['time'] is None:
+                sec['time'] = 0
+            if sec['time'] > effectsOnLPs[LP]['U']:
+                effectsOnLPs[LP]['U'] = sec['time']
+    '''
 
-    r = max(s, r) #Sets a lower bound  of r at the switching time (mostly error prevention)
+    ENS = 0
+    effectsOnLPs = {}
+    for sec in effectsOnSections:
+        ENS += sec['ENS']
+        for LP in sec['loads']:
+            if LP in effectsOnLPs:
+                if sec['time'] is None:
+                    sec['time'] = 0
+                elif sec['time'] > effectsOnLPs[LP]:
+                    effectsOnLPs[LP] = sec['time']
+            else:
+                if sec['time'] is None:
+                    effectsOnLPs[LP] = 0
+                else:
+                    effectsOnLPs[LP] = sec['time']
 
-    # Calculate switching times for each bus
-    switchingTimes = {}
-    for i in disconnectors:
-        if i['fromBus'] not in switchingTimes:
-            switchingTimes[i['fromBus']] = i['s']
-        else:
-            if i['s'] > switchingTimes[i['fromBus']]:
-                switchingTimes[i['fromBus']] = i['s']
-        if i['toBus'] not in switchingTimes:
-            switchingTimes[i['toBus']] = i['s']
-        else:
-            if i['s'] > switchingTimes[i['toBus']]:
-                switchingTimes[i['toBus']] = i['s']
+    # Return the final effects on load points
+    return effectsOnLPs, ENS
 
-    # Identify all isolated interconnections in the system
-    disconnectedSections = gs.findConnectedSegments(buses, sections)
 
-    # Record the effects on disconnected sections
-    for i in disconnectedSections:
-        effectsOnSections.append({
-            'state': 'tripped',
-            'loads': gs.findLoadPoints(i, loads),
-            'time': gs.switchingTime(i, switchingTimes),
-            'ENS': lc.loadCurveSumEnergy(t, gs.switchingTime(i, switchingTimes), gs.findLoadPoints(i, loads), loads, loadCurve)
-        })
+def resolveLoadCurveFaultOutcome(outcome, loads, generationData, t, r, loadCurve=0, DERScurve=0, DERS=False, loadCurveIndex=None):
+    """
+    Finds the effects on the segments of a fault at a given time and with a given duration from the structural
+    outcome of the fault (see EffectOfFault.faultOutcome).
 
-    # Reconnect protection devices and update the system state
-    buses, sections = gs.reconnectProtection(buses, sections, trippedProtection, fault)
+    Args:
+        outcome (dict): The outcome of the fault from EffectOfFault.faultOutcome.
+        loads (DataFrame): Data about loads in the system.
+        generationData (DataFrame): Data about generation in the system.
+        t (float): The time of the fault.
+        r (int): The fault duration.
+        loadCurve (array, optional): The load curve. Defaults to 0.
+        DERScurve (array, optional): The generation curve of the DERS (0 or False if not used). Defaults to 0.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+        loadCurveIndex (dict, optional): Index of the load curve from LoadCurve.createLoadCurveIndex, or of the load profiles from LoadCurve.createProfileIndex, created from loadCurve if not given. Defaults to None.
+
+    Returns:
+        list: Effects on the segments (state, load points, outage time and energy not supplied).
+    """
+    effectsOnSections = []
+    if loadCurveIndex is None:
+        loadCurveIndex = lc.createLoadCurveIndex(loadCurve)
+    useDERScurve = np.ndim(DERScurve) > 0
 
-    # Identify disconnected sections again after reconnection
-    disconnectedSections = gs.findConnectedSegments(buses, sections)
+    s = outcome['s']
+    r = max(s, r) #Sets a lower bound  of r at the switching time (mostly error prevention)
 
-    for i in disconnectedSections:
-        if sections['Upstream Bus'][fault] in i or sections['Downstream Bus'][fault] in i:
+    for i in outcome['segments']:
+        segmentLoads = i['loads']
+        if i['state'] == 'tripped':
+            effectsOnSections.append({
+                'state': 'tripped',
+                'loads': segmentLoads,
+                'time': i['time'],
+                'ENS': lc.outageEnergy(t, i['time'], segmentLoads, i['peakLoad'], loadCurveIndex)
+            })
+        elif i['state'] == 'fault':
             # Faulted section
             effectsOnSections.append({
                 'state': 'fault',
-                'loads': gs.findLoadPoints(i, loads),
+                'loads': segmentLoads,
                 'time': r,
-                'ENS': lc.loadCurveSumEnergy(t, r, gs.findLoadPoints(i, loads), loads, loadCurve)
+                'ENS': lc.outageEnergy(t, r, segmentLoads, i['peakLoad'], loadCurveIndex)
             })
-        elif gs.mainPower(i[0], buses, sections, generationData):
+        elif i['state'] == 'connected':
             # Section connected to the main power source
             effectsOnSections.append({
                 'state': 'connected',
-                'loads': gs.findLoadPoints(i, loads),
+                'loads': segmentLoads,
                 'time': 0,
                 'ENS': 0
             })
         else:
             if DERS:
-                if DERScurve:
-                    ENS, uBackup = lc.LCandDERScurve(t, r, s, gs.findLoadPoints(i, loads), loads, loadCurve, generationData, i , DERScurve)
+                if useDERScurve:
+                    ENS, uBackup = lc.DERSdispatch(t, r, s, i['peakLoad'], i['DERCapacity'], loadCurve, DERScurve)
                 else:
-                    uBackup = gf.loadCurveDistributedGeneration(
-                            lc.loadCurveSumEnergy(t+s, r-s, gs.findLoadPoints(i, loads), loads, loadCurve),
-                            lc.loadPeak(t+s, r-s, gs.findLoadPoints(i, loads), loads, loadCurve),
-                            generationData, 
-                            i, 
+                    uBackup = gf.loadCurveSegmentDistributedGeneration(
+                            lc.outageEnergy(t+s, r-s, segmentLoads, i['peakLoad'], loadCurveIndex),
+                            lc.outagePeak(t+s, r-s, segmentLoads, i['peakLoad'], loadCurveIndex),
+                            i['aggregates'], 
                             r,
                             s) #Calculates the outage duration after local generation is utilized
             else:
                 uBackup = r
-            
+
             # Check for backup feeders
-            connectedBackup = gs.findBackupFeeders(i, backupFeeders)
-            if connectedBackup:
-                for j in connectedBackup:
-                    if gs.mainPower(j['otherEnd'], buses, sections, generationData):
-                        if backupFeeders.at[j['backupFeeder'], 's'] < uBackup:
-                            breaker = gs.findProtection(j['otherEnd'], buses, sections)
+            if i['hasBackupFeeders']:
+                for j in i['feeders']:
+                    if j['s'] < uBackup:
+                        effectsOnSections.append({
+                            'state': 'backupPower',
+                            'loads': segmentLoads,
+                            'time': j['s'],
+                            'ENS': lc.outageEnergy(t, j['s'], segmentLoads, i['peakLoad'], loadCurveIndex)
+                        })
+                        if j['backupLoads'] is not None:
                             effectsOnSections.append({
-                                'state': 'backupPower',
-                                'loads': gs.findLoadPoints(i, loads),
-                                'time': backupFeeders['s'][j['backupFeeder']],
-                                'ENS': lc.loadCurveSumEnergy(t, backupFeeders['s'][j['backupFeeder']], gs.findLoadPoints(i, loads), loads, loadCurve)
+                                'state': 'backup',
+                                'loads': j['backupLoads'],
+                                'time': s,
+                                'ENS': lc.outageEnergy(t, s, j['backupLoads'], j['backupPeakLoad'], loadCurveIndex)
                             })
-                            if DSEBF:
-                                if breaker['direction'] == 'D':
-                                    endBus = sections['Upstream Bus'][breaker['section']]
-                                else:
-                                    endBus = breaker['bus']
-                                connected = gs.connectedBetween(j['otherEnd'], endBus, buses, sections, connected=[])
-                                effectsOnSections.append({
-                                    'state': 'backup',
-                                    'loads': gs.findLoadPoints(connected, loads),
-                                    'time': s,
-                                    'ENS': lc.loadCurveSumEnergy(t, s, gs.findLoadPoints(connected, loads), loads, loadCurve)
-                                })
-                        elif DERS:
-                            # If DERS are enabled and are prefferential to BF, use local generation
-                            if DERScurve:
-                                effectsOnSections.append({
+                    elif DERS:
+                        # If DERS are enabled and are prefferential to BF, use local generation
+                        if useDERScurve:
+                            effectsOnSections.append({
+                            'state': 'localGenerationOverBF',
+                            'loads': segmentLoads,
+                            'time': uBackup,
+                            'ENS': ENS
+                            })
+                        else:
+                            effectsOnSections.append({
                                 'state': 'localGenerationOverBF',
-                                'loads': gs.findLoadPoints(i, loads),
+                                'loads': segmentLoads,
                                 'time': uBackup,
-                                'ENS': ENS
-                                })
-                            else:
-                                effectsOnSections.append({
-                                    'state': 'localGenerationOverBF',
-                                    'loads': gs.findLoadPoints(i, loads),
-                                    'time': uBackup,
-                                    'ENS': lc.loadCurveSumEnergy(t, uBackup, gs.findLoadPoints(i, loads), loads, loadCurve)
-                                })
+                                'ENS': lc.outageEnergy(t, uBackup, segmentLoads, i['peakLoad'], loadCurveIndex)
+                            })
             elif DERS and uBackup < r:
                 # If no backup feeder is available, use local generation
-                if DERScurve:
+                if useDERScurve:
                     effectsOnSections.append({
                                 'state': 'localGenerationOverBF',
-                                'loads': gs.findLoadPoints(i, loads),
+                                'loads': segmentLoads,
                                 'time': uBackup,
                                 'ENS': ENS
                                 })
                 else:
                     effectsOnSections.append({
                                 'state': 'localGenerationOverBF',
-                                'loads': gs.findLoadPoints(i, loads),
+                                'loads': segmentLoads,
                                 'time': uBackup,
-                                'ENS': lc.loadCurveSumEnergy(t, uBackup, gs.findLoadPoints(i, loads), loads, loadCurve)
+                                'ENS': lc.outageEnergy(t, uBackup, segmentLoads, i['peakLoad'], loadCurveIndex)
                                 })
             else:
                 # No backup feeder available
                 effectsOnSections.append({
                     'state': 'noBackup',
-                    'loads': gs.findLoadPoints(i, loads),
+                    'loads': segmentLoads,
                     'time': r,
-                    'ENS': lc.loadCurveSumEnergy(t, r, gs.findLoadPoints(i, loads), loads, loadCurve)
+                    'ENS': lc.outageEnergy(t, r, segmentLoads, i['peakLoad'], loadCurveIndex)
                 })
 
-
-
-    #print('Effects on sections:', effectsOnSections)
-
-    
-    # Aggregate the effects on load points
-    ''''
-    ENS = 0
-    effectsOnLPs = {}
-    for LP in loads.index:
-        LPeffects = {'U': 0, 'ENS': 0}
-        effectsOnLPs[LP] = LPeffects
-    for sec in effectsOnSections:
-        ENS += sec['ENS']
-        for LP in sec['loads']:
-            if sec['time'] is None:
-                sec['time'] = 0
-            if sec['time'] > effectsOnLPs[LP]['U']:
-                effectsOnLPs[LP]['U'] = sec['time']
-    '''
-
-    ENS = 0
-    effectsOnLPs = {}
-    for sec in effectsOnSections:
-        ENS += sec['ENS']
-        for LP in sec['loads']:
-            if LP in effectsOnLPs:
-                if sec['time'] is None:
-                    sec['time'] = 0
-                elif sec['time'] > effectsOnLPs[LP]:
-                    effectsOnLPs[LP] = sec['time']
-            else:
-                if sec['time'] is None:
-                    effectsOnLPs[LP] = 0
-                else:
-                    effectsOnLPs[LP] = sec['time']
-
-
-
-    # Return the final effects on load points
-    #print('Effects on load points:', effectsOnLPs)
-    return effectsOnLPs, ENS
-
-
+    return effectsOnSections
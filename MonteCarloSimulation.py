@@ -1,17 +1,14 @@
-import pandas as pd
 import numpy as np
-import random as rng
-import GraphSearch as gs
-import MiscFunctions as mf
 import CreateSystem as cs
 import EffectOfFault as ef
 import VarianceCalculations as vc
 import LoadCurve as lc
 import LoadCurveEffectOfFault as lcef
-import copy
-import matplotlib.pyplot as plt
-from concurrent.futures import ThreadPoolExecutor
-from threading import Lock
+import Topology as tp
+import EventScheduler as es
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque
+import os
 
 '''
 RELRAD-software, general software for reliability studies of radial power systems
@@ -32,142 +29,158 @@ RELRAD-software, general software for reliability studies of radial power system
 '''
 
 
-def MonteCarlo(loc, outFile, beta = 0.05, nCap = 0, DSEBF = True, DERS = False, LoadCurve = False, DERScurve = False):
-    lock = Lock()
+def MonteCarlo(loc, outFile, beta = 0.05, nCap = 0, DSEBF = True, DERS = False, LoadCurve = False, DERScurve = False, cache = False, processes = False, workers = None, batchSize = 25, seed = None, minYears = 600, loadProfiles = None, profileStep = 1):
+    """
+    Runs a sequential Monte Carlo simulation of the system and writes the load point results to an Excel file.
+
+    The simulation stops when the beta value of the EENS estimate reaches the given beta after minYears years, or when
+    nCap years are simulated. The beta value is checked after every year, in the order of the years.
+
+    Args:
+        loc (str): Location of the system data.
+        outFile (str): Excel file the results are written to.
+        beta (float): Beta value (coefficient of variation of the EENS estimate) the simulation stops at.
+        nCap (int): Maximum number of simulated years, 0 gives no cap (the simulation runs until it converges, a system
+            without energy not supplied in the first minYears years raises a ValueError since beta can not be calculated).
+        DSEBF (bool): Enables disconnection of switches and backup feeders.
+        DERS (bool): Enables the use of the provided DERS.
+        LoadCurve (bool): Enables the use of the provided load curve.
+        DERScurve (bool): Enables the use of a DERS generation curve.
+        cache (bool): Stores the compiled system in a cache file.
+        processes (bool): Simulates the years on separate processes instead of threads.
+        workers (int): Number of threads/processes (None uses the number of cores).
+        batchSize (int): Number of years simulated by a thread/process at a time.
+        seed (int): Seed of the random streams.
+        minYears (int): Minimum number of simulated years before the convergence is checked (600, the pilot of the
+            earlier two-stage simulation).
+        loadProfiles (str): Load profile file used instead of the load curve.
+        profileStep (float): Length of the time steps of the load profiles in hours.
+    """
     # Load data from Excel files and create the system
-    system = cs.createSystem(loc, LoadCurve=LoadCurve)
+    system = cs.createSystem(loc, LoadCurve=LoadCurve, cache=cache)
+    system['components'] = es.createComponents(system['sections'])  # Failure data of the components, shared by all years
     
     h = 8736  # Total hours in a year (52 weeks * 7 days * 24 hours)
 
     if LoadCurve: # Create load curve if load curve data is provided
         loadCurve = lc.createLoadCurve(system['loadCurveData'])
+        if loadProfiles is None:
+            loadCurveIndex = lc.createLoadCurveIndex(loadCurve)
+        elif DERS and DERScurve:
+            raise ValueError('Load profiles can not be used with the DERS curve')
+        else: # Own profile for each load point, memory-mapped from the load profile file
+            loadCurveIndex = lc.openLoadProfiles(loadProfiles, system['loads'], step=profileStep)
     else:
         loadCurve = False
+        loadCurveIndex = None
+
+    # Independent random streams, the generation curve uses the root of the seed sequence and each year its own spawned child
+    seeds = np.random.SeedSequence(seed)
 
     if DERS and DERScurve: # Create a randomly generated Generation curve as an example (for doing this properly, a separate curve should be created for each (type of) DER)
-        DERScurve = lc.randomGenerationCurve()
+        DERScurve = lc.randomGenerationCurve(np.random.default_rng(seeds))
     
     #print(loadCurve)
-    # Perform Monte Carlo simulation for 600 years to find variance of EENS (multithreaded)
-    if nCap > 0:
-        n1 = max(nCap, 600)
-    else:
-        n1 = 600
-
-
-    EENS = []
-
-
-    testingU = []
-    testingF = [] 
-
 
-    if LoadCurve:
-        ENS = 0
-        # Perform Monte Carlo simulation for n years (multithreaded)
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(LoadCurveMonteCarloYear, system['sections'], system['buses'], system['loads'], system['generationData'], system['backupFeeders'], loadCurve, DERScurve, DSEBF=DSEBF, DERS = DERS) for year in range(n1)]
-            with lock:
-                for future in futures:
-                    results, yearlyENS = future.result()
-                    ENS += yearlyENS
-                    EENS.append(yearlyENS)
-                    for i in system['loads'].index:
-                        system['loads'].at[i, 'nrOfFaults'] += results[i]['nrOfFaults']
-                        system['loads'].at[i,'U'] += results[i]['U']
+    faultCache = ef.createFaultCache()  # Structural outcome of each fault, shared by all simulated years
 
+    # Simulate batches of years until the coefficient of variation of EENS reaches beta, or nCap years are simulated
+    # (multithreaded, or on separate processes that each create the system once)
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(loc, LoadCurve, cache, loadCurve, DERScurve, DSEBF, DERS, loadProfiles, profileStep))
     else:
-        # Perform Monte Carlo simulation for n years (multithreaded)
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(MonteCarloYear, system['sections'], system['buses'], system['loads'], system['generationData'], system['backupFeeders'], loadCurve, DSEBF=DSEBF, DERS = DERS) for year in range(n1)]
-            with lock:
-                for future in futures:
-                    yearlyEENS = 0
-                    results = future.result()
-                    for LP in results:
-                        yearlyEENS += results[LP]['U'] * system['loads'].at[LP, 'Load level average [MW]']
-                    EENS.append(yearlyEENS)
-                    for i in system['loads'].index:
-                        system['loads'].at[i, 'nrOfFaults'] += results[i]['nrOfFaults']
-                        system['loads'].at[i,'U'] += results[i]['U']
-
-    EENS = np.array(EENS)
-
-    
-    n2 = vc.calcNumberOfSimulations(EENS, beta)  # Calculate number of simulations needed for desired variance
-
-    #n2 = int(np.ceil(float(n2)*1.25))  # Increase number of simulations to 1.25 times the calculated value to compensate for inaccuracy in variance calculation (optional, should not be nessecary)
-    
-    if nCap > 0 and n2 > nCap: #Caps the number of simulations to nCap
-        n2 = nCap
-
-    n2 = max(0, n2 - n1) # Subtracts the already performed simulations from the total number of simulations needed
-
-    
-    if n2 > 0:
-        if LoadCurve:
-        # Perform Monte Carlo simulation for n years (multithreaded)
-            with ThreadPoolExecutor() as executor:
-                futures = [executor.submit(LoadCurveMonteCarloYear, system['sections'], system['buses'], system['loads'], system['generationData'], system['backupFeeders'], loadCurve, DERScurve, DSEBF=DSEBF) for year in range(n2)]
-                with lock:
-                    for future in futures:
-                        results, yearlyENS = future.result()
-                        ENS += yearlyENS
-                        EENS = np.append(EENS, yearlyENS)
-                        for i in system['loads'].index:
-                            system['loads'].at[i,'nrOfFaults'] += results[i]['nrOfFaults']
-                            system['loads'].at[i,'U'] += results[i]['U']
-
-        else:
-        # Perform Monte Carlo simulation for n years (multithreaded)
-            with ThreadPoolExecutor() as executor:
-                futures = [executor.submit(MonteCarloYear, system['sections'], system['buses'], system['loads'], system['generationData'], system['backupFeeders'], loadCurve, DSEBF=DSEBF) for year in range(n2)]
-                with lock:
-                    for future in futures:
-                        yearlyEENS = 0
-                        results = future.result()
-                        for LP in results:
-                            yearlyEENS += results[LP]['U'] * system['loads'].at[LP, 'Load level average [MW]']
-                        EENS = np.append(EENS, yearlyEENS)
-                        for i in system['loads'].index:
-                            system['loads'].at[i, 'nrOfFaults'] += results[i]['nrOfFaults']
-                            system['loads'].at[i,'U'] += results[i]['U']
-    
-    trueBeta = vc.calcBeta(EENS)  # Calculate the beta value for the EENS values
+        executor = ThreadPoolExecutor(max_workers=workers)
+    maxInFlight = 2 * (workers or os.cpu_count() or 1)  # Batches submitted ahead of the batch being checked
+
+    # Results are added to preallocated arrays as the batches finish, the yearly EENS values to a growable buffer
+    stats = vc.createRunningStats()
+    EENS = createBuffer()
+    ENS = 0
+    nrOfFaults = np.zeros(len(system['loads'].index), dtype=np.int64)
+    U = np.zeros(len(system['loads'].index), dtype=np.float64)
+    nSubmitted = 0
+    futures = deque()
+    while True:
+        while len(futures) < maxInFlight and (nCap <= 0 or nSubmitted < nCap):
+            n = batchSize if nCap <= 0 else min(batchSize, nCap - nSubmitted)
+            if processes:
+                futures.append(executor.submit(runYearBatch, seeds.spawn(n)))
+            else:
+                futures.append(executor.submit(simulateYears, system, seeds.spawn(n), LoadCurve, loadCurve, DERScurve, DSEBF, DERS, faultCache, loadCurveIndex))
+            nSubmitted += n
+        if not futures:
+            break
+
+        # Add the results of the next batch in the order of the years and check the convergence after each year,
+        # so the same seed gives the same results for any number of workers and batch size
+        results = futures.popleft().result()
+        converged = False
+        for year in range(len(results['EENS'])):
+            ENS += results['EENS'][year]
+            appendBuffer(EENS, results['EENS'][year])
+            vc.updateRunningStats(stats, results['EENS'][year])
+            nrOfFaults += results['nrOfFaults'][year]
+            U += results['U'][year]
+            if stats['n'] >= minYears and vc.runningBeta(stats) <= beta:
+                converged = True
+                break
+            if nCap <= 0 and stats['n'] == minYears and stats['mean'] == 0:
+                executor.shutdown(cancel_futures=True)
+                raise ValueError('No energy not supplied in %d simulated years, beta can not be calculated, give nCap to simulate a fixed number of years' % minYears)
+        faultCache['hits'] += results['hits']
+        faultCache['misses'] += results['misses']
+
+        if converged:
+            break
+
+    executor.shutdown(cancel_futures=True)
+
+    nYears = stats['n']
+    EENS = bufferValues(EENS)
+    system['loads']['nrOfFaults'] += nrOfFaults
+    system['loads']['U'] += U
+
+    trueBeta = vc.calcBeta(EENS) if ENS > 0 else np.inf  # Calculate the beta value for the EENS values
 
 
     if LoadCurve:
-        for LP in system['loads'].index:
-            system['loads'].at[LP, 'Lambda'] = system['loads'].at[LP, 'nrOfFaults'] / (n2+n1)
-            system['loads'].at[LP, 'U']/= (n2+n1)
+        system['loads']['Lambda'] = system['loads']['nrOfFaults'] / nYears
+        system['loads']['U'] /= nYears
         
         system['loads']['R'] = system['loads']['U'] / system['loads']['Lambda']
         system['loads']['SAIFI'] = system['loads']['Lambda'] * system['loads']['Number of customers']
         system['loads']['SAIDI'] = system['loads']['U'] * system['loads']['Number of customers']
         system['loads']['CAIDI'] = system['loads']['R'] * system['loads']['Number of customers']
-        #system['loads']['EENS'] = system['loads']['ENS'] / (n1 + n2)
+        #system['loads']['EENS'] = system['loads']['ENS'] / nYears
 
         system['loads'].at['TOTAL', 'Number of customers'] = system['loads']['Number of customers'].sum()
-        system['loads'].at['TOTAL', 'Load level average [MW]'] = system['loads']['Load point peak [MW]'].sum()*sum(loadCurve)/h
-        system['loads'].at['TOTAL', 'Load point peak [MW]'] = system['loads']['Load point peak [MW]'].max()*max(loadCurve)
+        if loadProfiles is None:
+            system['loads'].at['TOTAL', 'Load level average [MW]'] = system['loads']['Load point peak [MW]'].sum()*sum(loadCurve)/h
+            system['loads'].at['TOTAL', 'Load point peak [MW]'] = system['loads']['Load point peak [MW]'].max()*max(loadCurve)
+        else:
+            rows = list(range(len(loadCurveIndex['peakLoad'])))
+            system['loads'].at['TOTAL', 'Load level average [MW]'] = loadCurveIndex['peakLoad'] @ lc.profileCumulativeEnergy(h, rows, loadCurveIndex)/h
+            system['loads'].at['TOTAL', 'Load point peak [MW]'] = (loadCurveIndex['peakLoad'] * np.max(loadCurveIndex['profiles'], axis=1)).max()
         system['loads'].at['TOTAL', 'SAIFI'] = system['loads']['SAIFI'].sum() / (system['loads'].at['TOTAL', 'Number of customers'])
         system['loads'].at['TOTAL', 'SAIDI'] = system['loads']['SAIDI'].sum() / (system['loads'].at['TOTAL', 'Number of customers'])
         system['loads'].at['TOTAL', 'CAIDI'] = system['loads'].at['TOTAL', 'SAIDI'] / system['loads'].at['TOTAL', 'SAIFI']
-        system['loads'].at['TOTAL', 'EENS'] = ENS / (n1 + n2)
-        system['loads'].at['TOTAL', 'nr of simulations'] = n1 + n2
+        system['loads'].at['TOTAL', 'EENS'] = ENS / nYears
+        system['loads'].at['TOTAL', 'nr of simulations'] = nYears
         system['loads'].at['TOTAL', 'provided beta'] = beta
         system['loads'].at['TOTAL', 'calculated beta'] = trueBeta
         CI = vc.calcConfidenceInterval(EENS)  # Calculate the confidence interval for the EENS values
         system['loads'].at['TOTAL', 'EENS 95% CI'] = str(CI['CI95'])
         system['loads'].at['TOTAL', 'EENS 99% CI'] = str(CI['CI99'])
+        system['loads'].at['TOTAL', 'fault cache hits'] = faultCache['hits']
+        system['loads'].at['TOTAL', 'fault cache misses'] = faultCache['misses']
+        system['loads'].at['TOTAL', 'seed'] = str(seeds.entropy)
 
 
 
     else:
         # Calculate average failure rate and unavailability for each load point
-        for LP in system['loads'].index:
-            system['loads'].at[LP, 'Lambda'] = system['loads'].at[LP, 'nrOfFaults'] / (n2+n1)
-            system['loads'].at[LP, 'U']/= (n2+n1)
+        system['loads']['Lambda'] = system['loads']['nrOfFaults'] / nYears
+        system['loads']['U'] /= nYears
 
         system['loads']['R'] = system['loads']['U'] / system['loads']['Lambda']
         system['loads']['SAIFI'] = system['loads']['Lambda'] * system['loads']['Number of customers']
@@ -182,12 +195,15 @@ def MonteCarlo(loc, outFile, beta = 0.05, nCap = 0, DSEBF = True, DERS = False,
         system['loads'].at['TOTAL', 'SAIDI'] = system['loads']['SAIDI'].sum() / (system['loads'].at['TOTAL', 'Number of customers'])
         system['loads'].at['TOTAL', 'CAIDI'] = system['loads'].at['TOTAL', 'SAIDI'] / system['loads'].at['TOTAL', 'SAIFI']
         system['loads'].at['TOTAL', 'EENS'] = system['loads']['EENS'].sum()
-        system['loads'].at['TOTAL', 'nr of simulations'] = n1 + n2
+        system['loads'].at['TOTAL', 'nr of simulations'] = nYears
         system['loads'].at['TOTAL', 'provided beta'] = beta
         system['loads'].at['TOTAL', 'calculated beta'] = trueBeta
         CI = vc.calcConfidenceInterval(EENS)  # Calculate the confidence interval for the EENS values
         system['loads'].at['TOTAL', 'EENS 95% CI'] = str(CI['CI95'])
         system['loads'].at['TOTAL', 'EENS 99% CI'] = str(CI['CI99'])
+        system['loads'].at['TOTAL', 'fault cache hits'] = faultCache['hits']
+        system['loads'].at['TOTAL', 'fault cache misses'] = faultCache['misses']
+        system['loads'].at['TOTAL', 'seed'] = str(seeds.entropy)
         # Print and save results        
     
     system['loads'].to_excel(outFile, sheet_name='Load Points')
@@ -195,71 +211,246 @@ def MonteCarlo(loc, outFile, beta = 0.05, nCap = 0, DSEBF = True, DERS = False,
 
 
 
-def GenerateHistory (l, r):
-    TTF = (-1/l) * np.log(rng.uniform(0,0.999)) * 8736
-    TTR = -r * np.log(rng.uniform(0,0.999))
+workerState = {}  # The system and settings of a worker process, set by initWorker
+
+
+def initWorker(loc, LoadCurve, cache, loadCurve, DERScurve, DSEBF, DERS, loadProfiles=None, profileStep=1):
+    """
+    Initializes a worker process of the process based Monte Carlo simulation, the system is created once per process.
+
+    Args:
+        loc (str): The location of the input file.
+        LoadCurve (bool): Flag indicating if the load curve is used.
+        cache (bool): Flag indicating if the system cache is used.
+        loadCurve (array): The load curve (False if not used).
+        DERScurve (list): The generation curve of the DERS (False if not used).
+        DSEBF (bool): (Down Stream Effect of Backup Feeder) flag.
+        DERS (bool): Flag indicating if distributed energy resources are used.
+        loadProfiles (str, optional): Location of the load profile file (None if not used). Defaults to None.
+        profileStep (float, optional): Length of the time steps of the load profiles in hours. Defaults to 1.
+    """
+    workerState['system'] = cs.createSystem(loc, LoadCurve=LoadCurve, cache=cache)
+    workerState['system']['components'] = es.createComponents(workerState['system']['sections'])
+    workerState['LoadCurve'] = LoadCurve
+    workerState['loadCurve'] = loadCurve
+    if not LoadCurve:
+        workerState['loadCurveIndex'] = None
+    elif loadProfiles is None:
+        workerState['loadCurveIndex'] = lc.createLoadCurveIndex(loadCurve)
+    else:
+        workerState['loadCurveIndex'] = lc.openLoadProfiles(loadProfiles, workerState['system']['loads'], step=profileStep)
+    workerState['DERScurve'] = DERScurve
+    workerState['DSEBF'] = DSEBF
+    workerState['DERS'] = DERS
+    workerState['faultCache'] = ef.createFaultCache()
+
+
+def createBuffer(capacity = 1024):
+    """
+    Creates a growable buffer of float values.
+
+    Args:
+        capacity (int, optional): Initial capacity. Defaults to 1024.
+
+    Returns:
+        dict: The buffer.
+    """
+    return {'values': np.zeros(capacity, dtype=np.float64), 'n': 0}
+
+
+def appendBuffer(buffer, value):
+    """
+    Adds a value to a buffer, the capacity is doubled when the buffer is full.
+
+    Args:
+        buffer (dict): The buffer (is updated).
+        value (float): The value.
+    """
+    if buffer['n'] == len(buffer['values']):
+        values = np.zeros(2 * len(buffer['values']), dtype=np.float64)
+        values[:buffer['n']] = buffer['values']
+        buffer['values'] = values
+    buffer['values'][buffer['n']] = value
+    buffer['n'] += 1
+
+
+def bufferValues(buffer):
+    """
+    Finds the values in a buffer.
+
+    Args:
+        buffer (dict): The buffer.
+
+    Returns:
+        array: The values.
+    """
+    return buffer['values'][:buffer['n']]
+
+
+def simulateYears(system, yearSeeds, LoadCurve, loadCurve, DERScurve, DSEBF, DERS, faultCache, loadCurveIndex=None):
+    """
+    Simulates a batch of years.
+
+    Args:
+        system (dict): The system, with the components from EventScheduler.createComponents.
+        yearSeeds (list): SeedSequence of each year to simulate.
+        LoadCurve (bool): Flag indicating if the load curve is used.
+        loadCurve (array): The load curve (False if not used).
+        DERScurve (list): The generation curve of the DERS (False if not used).
+        DSEBF (bool): (Down Stream Effect of Backup Feeder) flag.
+        DERS (bool): Flag indicating if distributed energy resources are used.
+        faultCache (dict): Fault cache of the run (the outcomes are shared, the hits and misses are counted per batch).
+        loadCurveIndex (dict, optional): Index of the load curve from LoadCurve.createLoadCurveIndex, or of the load profiles from LoadCurve.createProfileIndex. Defaults to None.
+
+    Returns:
+        dict: Results of the batch.
+            nrOfFaults/U: number of faults and unavailability of each load point in each year (years x load points)
+            EENS: energy not supplied in each year
+            hits/misses: fault cache hits and misses in the batch
+    """
+    # The batches running on other threads share the outcomes, the counters are only updated by this batch and are
+    # added up by the driver
+    faultCache = {'outcomes': faultCache['outcomes'], 'hits': 0, 'misses': 0}
+    loads = system['loads']
+    nrOfFaults = np.zeros((len(yearSeeds), len(loads.index)), dtype=np.int64)
+    U = np.zeros((len(yearSeeds), len(loads.index)), dtype=np.float64)
+    EENS = np.zeros(len(yearSeeds), dtype=np.float64)
+    for year, yearSeed in enumerate(yearSeeds):
+        generator = np.random.default_rng(yearSeed)
+        if LoadCurve:
+            results, yearlyEENS = LoadCurveMonteCarloYear(system['components'], system['topology'], loads, system['generationData'], loadCurve, DERScurve, DSEBF=DSEBF, DERS=DERS, faultCache=faultCache, generator=generator, loadCurveIndex=loadCurveIndex)
+        else:
+            results = MonteCarloYear(system['components'], system['topology'], loads, system['generationData'], loadCurve, DSEBF=DSEBF, DERS=DERS, faultCache=faultCache, generator=generator)
+            yearlyEENS = 0
+            for LP in results:
+                yearlyEENS += results[LP]['U'] * loads.at[LP, 'Load level average [MW]']
+        EENS[year] = yearlyEENS
+        for n, LP in enumerate(loads.index):
+            nrOfFaults[year, n] = results[LP]['nrOfFaults']
+            U[year, n] = results[LP]['U']
+    return {'nrOfFaults': nrOfFaults, 'U': U, 'EENS': EENS, 'hits': faultCache['hits'], 'misses': faultCache['misses']}
+
+
+def runYearBatch(yearSeeds):
+    """
+    Simulates a batch of years in a worker process.
+
+    Args:
+        yearSeeds (list): SeedSequence of each year to simulate.
+
+    Returns:
+        dict: Results of the batch (see simulateYears).
+    """
+    return simulateYears(workerState['system'], yearSeeds, workerState['LoadCurve'], workerState['loadCurve'], workerState['DERScurve'], workerState['DSEBF'], workerState['DERS'], workerState['faultCache'], workerState['loadCurveIndex'])
+
+
+def createHistorySampler(l, r, generator, blockSize = 8):
+    """
+    Creates a sampler of failure histories, the times to failure and repair times are drawn in blocks of blockSize
+    samples for every component at once.
+
+    Args:
+        l (array): Failure rate of each component.
+        r (array): Repair time of each component.
+        generator (Generator): NumPy random generator.
+        blockSize (int, optional): Number of samples drawn for a component at a time. Defaults to 8.
+
+    Returns:
+        dict: The sampler, with a block of TTF and TTR samples for each component (components x blockSize).
+    """
+    sampler = {
+        'l': l,
+        'r': r,
+        'generator': generator,
+        'blockSize': blockSize,
+        'next': np.zeros(len(l), dtype=np.int64)
+    }
+    sampler['TTF'], sampler['TTR'] = drawHistories(l, r, generator, (len(l), blockSize))
+    return sampler
+
+
+def drawHistories(l, r, generator, size):
+    """
+    Draws exponentially distributed times to failure and repair times.
+
+    Args:
+        l (array): Failure rate of each component (a column for several samples per component).
+        r (array): Repair time of each component (a column for several samples per component).
+        generator (Generator): NumPy random generator.
+        size (tuple): Shape of the samples.
+
+    Returns:
+        tuple: Times to failure and repair times.
+    """
+    if len(size) == 2:
+        l = l[:, np.newaxis]
+        r = r[:, np.newaxis]
+    with np.errstate(divide='ignore'):
+        TTF = (-1/l) * np.log(generator.uniform(0, 0.999, size)) * 8736  # Components with no failure rate never fail
+    TTR = -r * np.log(generator.uniform(0, 0.999, size))
     return TTF, TTR
 
 
-def minTTF(history):
-    TTFcomponent = next(iter(history))
-    TTF = history[TTFcomponent]['TTF']
-    for secComp in history:
-        if history[secComp]['TTF'] < TTF:
-            TTFcomponent = secComp
-            TTF = history[secComp]['TTF']
-    return TTFcomponent
+def nextHistory(sampler, comp):
+    """
+    Finds the next time to failure and repair time of a component, the block of the component is drawn again when
+    all its samples are used.
+
+    Args:
+        sampler (dict): The sampler (is updated).
+        comp (int): The component number.
+
+    Returns:
+        tuple: Time to failure and repair time.
+    """
+    i = sampler['next'][comp]
+    if i == sampler['blockSize']:
+        sampler['TTF'][comp], sampler['TTR'][comp] = drawHistories(sampler['l'][comp], sampler['r'][comp], sampler['generator'], (sampler['blockSize'],))
+        i = 0
+    sampler['next'][comp] = i + 1
+    return sampler['TTF'][comp, i], sampler['TTR'][comp, i]
 
 
-def overlappingFaults(fault, history): #testing function (can be neglected)
-    # Check if the fault overlaps with any other faults in the history
-    for secComp in history:
+def overlappingFaults(fault, scheduler): #testing function (can be neglected)
+    # Check if the fault overlaps with any other faults in the scheduler
+    TTF = scheduler['TTF']
+    TTR = scheduler['TTR']
+    for secComp in range(len(TTF)):
         if secComp != fault:
-            if (history[secComp]['TTF'] < history[fault]['TTF'] + history[fault]['TTR']) and (history[secComp]['TTF'] + history[secComp]['TTR'] > history[fault]['TTF']):
+            if (TTF[secComp] < TTF[fault] + TTR[fault]) and (TTF[secComp] + TTR[secComp] > TTF[fault]):
                 return True
     return False
 
 
-def MonteCarloYear(sectionsOriginal, busesOriginal, loads, generationData, backupFeeders, loadCurve, DSEBF=True, DERS = False):
+def MonteCarloYear(components, topology, loads, generationData, loadCurve, DSEBF=True, DERS = False, faultCache=None, generator=None):
     h = 8736  # Total hours in a year
-    faultHistory = [] #testing variable for intermediate results
     results = {}
     for i in loads.index:
         results[i] = {'nrOfFaults': 0, 'U': 0}
-    history = {}
+    if generator is None:
+        generator = np.random.default_rng()
+    scheduler = es.createScheduler(components)
+    sampler = createHistorySampler(scheduler['l'], scheduler['r'], generator)
         # Generate failure history for each component
-    for sec in sectionsOriginal.index:
-        for comp in sectionsOriginal['Components'][sec]:
-            TTF, TTR = GenerateHistory(sectionsOriginal['Components'][sec][comp]['lambda'], sectionsOriginal['Components'][sec][comp]['r'])
-            history[sec + comp] = {
-                'sec': sec,
-                'comp': comp,
-                'TTF': TTF,
-                'TTR': TTR,
-                'l': sectionsOriginal['Components'][sec][comp]['lambda'],
-                'r': sectionsOriginal['Components'][sec][comp]['r']}
+    for comp in range(len(scheduler['sec'])):
+        TTF, TTR = nextHistory(sampler, comp)
+        es.schedule(scheduler, comp, TTF, TTR)
 
         # Find the first fault to occur
-    fault = minTTF(history)
+    fault = es.nextFailure(scheduler)
     #overlap = 0 #test vaiable to test for overlapping faults
-    while history[fault]['TTF'] < h:
-        faultHistory.append({'fault': fault, 'TTF': history[fault]['TTF'], 'TTR': history[fault]['TTR'], 'sec': history[fault]['sec'], 'comp': history[fault]['comp']}) #testing variable to store the fault history
+    while scheduler['TTF'][fault] < h:
         #count if there is an overlapping fault
-        #if overlappingFaults(fault, history):
+        #if overlappingFaults(fault, scheduler):
             #overlap += 1
-        # Create deep copies of the original data for analysis
-        sectionsCopy = pd.DataFrame(columns=sectionsOriginal.columns,
-                                    data=copy.deepcopy(sectionsOriginal.values),
-                                    index=sectionsOriginal.index)
-        busesCopy = pd.DataFrame(columns=busesOriginal.columns,
-                                    data=copy.deepcopy(busesOriginal.values),
-                                    index=busesOriginal.index)
+        # Create a topology overlay for the analysis of the fault
+        overlay = tp.createOverlay(topology)
             
         # Makes sure the calculation does not go into the next year    
-        if history[fault]['TTF'] + history[fault]['TTR'] > h:
-            history[fault]['TTR'] = h - history[fault]['TTF']
+        if scheduler['TTF'][fault] + scheduler['TTR'][fault] > h:
+            scheduler['TTR'][fault] = h - scheduler['TTF'][fault]
         # Calculate the effects of faults on load points
-        effectOnLPs = ef.faultEffects(history[fault]['sec'], history[fault]['comp'], busesCopy, sectionsCopy, loads, generationData, backupFeeders, history[fault]['TTR'], loadCurve=loadCurve, DSEBF=DSEBF, DERS = DERS)
+        effectOnLPs = ef.faultEffects(scheduler['sec'][fault], scheduler['comp'][fault], overlay, loads, generationData, scheduler['TTR'][fault], loadCurve=loadCurve, DSEBF=DSEBF, DERS = DERS, faultCache=faultCache)
             
         for LP in effectOnLPs:
             if effectOnLPs[LP] > 0:
@@ -268,52 +459,44 @@ def MonteCarloYear(sectionsOriginal, busesOriginal, loads, generationData, backu
                 results[LP]['U'] += effectOnLPs[LP]
 
         # Generate new failure history for the faulted component
-        newTTF, newTTR = GenerateHistory(history[fault]['l'], history[fault]['r'])
+        newTTF, newTTR = nextHistory(sampler, fault)
 
-        history[fault]['TTF'] += newTTF + history[fault]['TTR']
-        history[fault]['TTR'] = newTTR
-        fault = minTTF(history)
+        es.reschedule(scheduler, fault, scheduler['TTF'][fault] + newTTF + scheduler['TTR'][fault], newTTR)
+        fault = es.nextFailure(scheduler)
     #if overlap > 0:
         #print('overlap', overlap)
     return results
 
 
-def LoadCurveMonteCarloYear(sectionsOriginal, busesOriginal, loads, generationData, backupFeeders, loadCurve, DERScurve, DSEBF=True, DERS = False):
+def LoadCurveMonteCarloYear(components, topology, loads, generationData, loadCurve, DERScurve, DSEBF=True, DERS = False, faultCache=None, generator=None, loadCurveIndex=None):
     h = 8736  # Total hours in a year
     results = {}
     totalENS = 0
     for i in loads.index:
         results[i] = {'nrOfFaults': 0, 'U': 0}
-    history = {}
+    if generator is None:
+        generator = np.random.default_rng()
+    if loadCurveIndex is None:
+        loadCurveIndex = lc.createLoadCurveIndex(loadCurve)
+    scheduler = es.createScheduler(components)
+    sampler = createHistorySampler(scheduler['l'], scheduler['r'], generator)
         # Generate failure history for each component
-    for sec in sectionsOriginal.index:
-        for comp in sectionsOriginal['Components'][sec]:
-            TTF, TTR = GenerateHistory(sectionsOriginal['Components'][sec][comp]['lambda'], sectionsOriginal['Components'][sec][comp]['r'])
-            history[sec + comp] = {
-                'sec': sec,
-                'comp': comp,
-                'TTF': TTF,
-                'TTR': TTR,
-                'l': sectionsOriginal['Components'][sec][comp]['lambda'],
-                'r': sectionsOriginal['Components'][sec][comp]['r']}
+    for comp in range(len(scheduler['sec'])):
+        TTF, TTR = nextHistory(sampler, comp)
+        es.schedule(scheduler, comp, TTF, TTR)
 
         # Find the first fault to occur
-    fault = minTTF(history)
-    while history[fault]['TTF'] < h:
+    fault = es.nextFailure(scheduler)
+    while scheduler['TTF'][fault] < h:
         #print(fault)
-            # Create deep copies of the original data for analysis
-        sectionsCopy = pd.DataFrame(columns=sectionsOriginal.columns,
-                                    data=copy.deepcopy(sectionsOriginal.values),
-                                    index=sectionsOriginal.index)
-        busesCopy = pd.DataFrame(columns=busesOriginal.columns,
-                                    data=copy.deepcopy(busesOriginal.values),
-                                    index=busesOriginal.index)
+            # Create a topology overlay for the analysis of the fault
+        overlay = tp.createOverlay(topology)
             
         # Makes sure the calculation does not go into the next year    
-        if history[fault]['TTF'] + history[fault]['TTR'] > h:
-            history[fault]['TTR'] = h - history[fault]['TTF']
+        if scheduler['TTF'][fault] + scheduler['TTR'][fault] > h:
+            scheduler['TTR'][fault] = h - scheduler['TTF'][fault]
         # Calculate the effects of faults on load points
-        effectOnLPs, ENS = lcef.loadCurveFaultEffects(history[fault]['sec'], history[fault]['comp'], busesCopy, sectionsCopy, loads, generationData, backupFeeders, history[fault]['TTF'], history[fault]['TTR'], loadCurve=loadCurve, DERScurve=DERScurve, DSEBF=DSEBF, DERS = DERS)
+        effectOnLPs, ENS = lcef.loadCurveFaultEffects(scheduler['sec'][fault], scheduler['comp'][fault], overlay, loads, generationData, scheduler['TTF'][fault], scheduler['TTR'][fault], loadCurve=loadCurve, DERScurve=DERScurve, DSEBF=DSEBF, DERS = DERS, faultCache=faultCache, loadCurveIndex=loadCurveIndex)
 
         totalENS += ENS    
         for LP in effectOnLPs:
@@ -324,9 +507,8 @@ def LoadCurveMonteCarloYear(sectionsOriginal, busesOriginal, loads, generationDa
                 #results[LP]['ENS'] += effectOnLPs[LP]['ENS']
 
         # Generate new failure history for the faulted component
-        newTTF, newTTR = GenerateHistory(history[fault]['l'], history[fault]['r'])
+        newTTF, newTTR = nextHistory(sampler, fault)
 
-        history[fault]['TTF'] += newTTF + history[fault]['TTR']
-        history[fault]['TTR'] = newTTR
-        fault = minTTF(history)
+        es.reschedule(scheduler, fault, scheduler['TTF'][fault] + newTTF + scheduler['TTR'][fault], newTTR)
+        fault = es.nextFailure(scheduler)
     return results, totalENS
\ No newline at end of file
@@ -1,8 +1,12 @@
 import pandas as pd
 import EffectOfFault as ef
 import CreateSystem as cs
-import copy
-from concurrent.futures import ThreadPoolExecutor
+import Topology as tp
+import AnalyticalRELRAD as ar
+import ImpactMatrix as im
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import os
 
 '''
 RELRAD-software, general software for reliability studies of radial power systems
@@ -22,13 +26,15 @@ RELRAD-software, general software for reliability studies of radial power system
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
-def RELRAD(loc, outFile, DSEBF=True, DERS=False, createFIM=False):
+def RELRAD(loc, outFile, DSEBF=True, DERS=False, createFIM=False, cache=False, analytical=False, processes=False, workers=None, FIMFile=None):
 
     #create system data
-    system = cs.createSystem(loc)
+    system = cs.createSystem(loc, cache=cache)
     
     if createFIM:
-        FIM = pd.DataFrame(columns=system['loads'].index, index=system['sections'].index)
+        FIM = im.createImpactMatrix(system['sections'].index, system['loads'].index)
+        if FIMFile is None:
+            im.checkSheetSize(FIM)  # Fails before the analysis if the FIM sheet can not be written
     
     # Create a list of all components in the system
     componentList = []
@@ -49,41 +55,29 @@ def RELRAD(loc, outFile, DSEBF=True, DERS=False, createFIM=False):
 
 
 
-    # Iterate through each section and component to calculate effects on load points
-    for sec in system['sections'].index:
-        for comp in system['sections']['Components'][sec]:
-            print(sec, comp)
-            # Create deep copies of the original data for analysis
-            sectionsCopy = pd.DataFrame(columns=system['sections'].columns,
-                                        data=copy.deepcopy(system['sections'].values),
-                                        index=system['sections'].index)
-            busesCopy = pd.DataFrame(columns=system['buses'].columns,
-                                     data=copy.deepcopy(system['buses'].values),
-                                     index=system['buses'].index)
-            
-            # Calculate the effects of faults on load points
-            
+    if analytical:
+        if createFIM:
+            raise ValueError('The FIM is not available with the analytical RELRAD, use analytical=False')
+        # Calculate the indices of all load points in one pass over the radial tree
+        Lambda, U = ar.loadPointIndices(system, DSEBF=DSEBF, DERS=DERS)
+        system['loads']['Lambda'] += Lambda
+        system['loads']['U'] += U
+    else:
+        if processes:
+            # Evaluate the sections in chunks on separate processes, the results are merged in the order of the sections
+            sections = list(system['sections'].index)
+            chunkSize = max(1, -(-len(sections) // (4 * (workers or os.cpu_count() or 1))))
+            chunks = [sections[i:i + chunkSize] for i in range(0, len(sections), chunkSize)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(loc, cache)) as executor:
+                evaluated = [i for chunk in executor.map(runSections, chunks, repeat(DSEBF), repeat(DERS), repeat(createFIM)) for i in chunk]
+        else:
+            evaluated = evaluateSections(system, system['sections'].index, DSEBF, DERS, createFIM)
+
+        # Add the effects of each component on the load points, in the order of the sections and components
+        for sec, comp, effectOnLPs, FIMrow in evaluated:
             if createFIM:
-                effectOnLPs, EOS = ef.faultEffects(sec, comp, busesCopy, sectionsCopy, system['loads'], system['generationData'], system['backupFeeders'], system['sections']['Components'][sec][comp]['r'], DSEBF=DSEBF, DERS=DERS, createFIM = createFIM)
-                for i in EOS:
-                    if i['state'] == 'fault':
-                        for j in i['loads']:
-                            FIM.at[sec, j] = 'F'
-                    elif i['state'] == 'connected':
-                        for j in i['loads']:
-                            if effectOnLPs[j] == 0:
-                                FIM.at[sec, j] = '0'
-                            else:
-                                FIM.at[sec, j] = 'M'
-                    elif i['state'] == 'backupPower':
-                        for j in i['loads']:
-                            FIM.at[sec, j] = 'B'
-                    elif i['state'] == 'noBackup':
-                        for j in i['loads']:
-                            FIM.at[sec, j] = 'N'
-            else:
-                effectOnLPs = ef.faultEffects(sec, comp, busesCopy, sectionsCopy, system['loads'], system['generationData'], system['backupFeeders'], system['sections']['Components'][sec][comp]['r'], DSEBF=DSEBF, DERS=DERS)
-            
+                im.setStates(FIM, sec, FIMrow)
+
             componentTag = sec + comp
             for LP in effectOnLPs:
                 if effectOnLPs[LP] > 0:
@@ -94,7 +88,6 @@ def RELRAD(loc, outFile, DSEBF=True, DERS=False, createFIM=False):
                     # Update load point data
                     system['loads'].loc[LP, 'Lambda'] += system['sections']['Components'][sec][comp]['lambda']
                     system['loads'].loc[LP, 'U'] += system['sections']['Components'][sec][comp]['lambda'] * effectOnLPs[LP]
-            print('LPs', effectOnLPs)
     # Print and save results
     system['loads']['R'] = system['loads']['U'] / system['loads']['Lambda']
     system['loads']['SAIFI'] = system['loads']['Lambda'] * system['loads']['Number of customers']
@@ -109,7 +102,88 @@ def RELRAD(loc, outFile, DSEBF=True, DERS=False, createFIM=False):
     system['loads'].at['TOTAL', 'SAIDI'] = system['loads']['SAIDI'].sum() / (system['loads'].at['TOTAL', 'Number of customers'])
     system['loads'].at['TOTAL', 'CAIDI'] = system['loads'].at['TOTAL', 'SAIDI'] / system['loads'].at['TOTAL', 'SAIFI']
     system['loads'].at['TOTAL', 'EENS'] = system['loads']['EENS'].sum()
-    # Print and save results        
-    system['loads'].to_excel(outFile, sheet_name='Load Points')
-    if createFIM:
-        FIM.to_excel(outFile, sheet_name='FIM')
\ No newline at end of file
+    # Print and save results, the FIM is written to its own file in long format if FIMFile is given
+    with pd.ExcelWriter(outFile) as writer:
+        system['loads'].to_excel(writer, sheet_name='Load Points')
+        if createFIM and FIMFile is None:
+            im.toDataFrame(FIM).to_excel(writer, sheet_name='FIM')
+    if createFIM and FIMFile is not None:
+        im.writeColumns(FIM, FIMFile)
+
+
+workerState = {}  # The system of a worker process, set by initWorker
+
+
+def initWorker(loc, cache):
+    """
+    Initializes a worker process of the process based RELRAD, the system is created once per process.
+
+    Args:
+        loc (str): Location of the input file.
+        cache (bool): Flag indicating if the compiled system is stored in a cache file.
+    """
+    workerState['system'] = cs.createSystem(loc, cache=cache)
+
+
+def evaluateSections(system, sections, DSEBF=True, DERS=False, createFIM=False):
+    """
+    Calculates the effects of a fault in each component of a list of sections on the load points.
+
+    Args:
+        system (dict): The system from CreateSystem.createSystem.
+        sections (list): The sections.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+        createFIM (bool, optional): Flag indicating if the FIM entries are found. Defaults to False.
+
+    Returns:
+        list: (section, component, effects on load points, FIM entries of the load points or None) for each component.
+    """
+    faultCache = ef.createFaultCache()
+    evaluated = []
+    for sec in sections:
+        for comp in system['sections']['Components'][sec]:
+            # Create a topology overlay for the analysis of the fault
+            overlay = tp.createOverlay(system['topology'])
+
+            # Calculate the effects of faults on load points
+            if createFIM:
+                effectOnLPs, EOS = ef.faultEffects(sec, comp, overlay, system['loads'], system['generationData'], system['sections']['Components'][sec][comp]['r'], DSEBF=DSEBF, DERS=DERS, createFIM = createFIM, faultCache=faultCache)
+                FIMrow = {}
+                for i in EOS:
+                    if i['state'] == 'fault':
+                        for j in i['loads']:
+                            FIMrow[j] = 'F'
+                    elif i['state'] == 'connected':
+                        for j in i['loads']:
+                            if effectOnLPs[j] == 0:
+                                FIMrow[j] = '0'
+                            else:
+                                FIMrow[j] = 'M'
+                    elif i['state'] == 'backupPower':
+                        for j in i['loads']:
+                            FIMrow[j] = 'B'
+                    elif i['state'] == 'noBackup':
+                        for j in i['loads']:
+                            FIMrow[j] = 'N'
+            else:
+                effectOnLPs = ef.faultEffects(sec, comp, overlay, system['loads'], system['generationData'], system['sections']['Components'][sec][comp]['r'], DSEBF=DSEBF, DERS=DERS, faultCache=faultCache)
+                FIMrow = None
+            evaluated.append((sec, comp, effectOnLPs, FIMrow))
+    return evaluated
+
+
+def runSections(sections, DSEBF, DERS, createFIM):
+    """
+    Calculates the effects of the components of a chunk of sections in a worker process.
+
+    Args:
+        sections (list): The sections.
+        DSEBF (bool): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool): Flag indicating if distributed energy resources are used.
+        createFIM (bool): Flag indicating if the FIM entries are found.
+
+    Returns:
+        list: The results of evaluateSections.
+    """
+    return evaluateSections(workerState['system'], sections, DSEBF, DERS, createFIM)
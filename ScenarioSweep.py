@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+import CreateSystem as cs
+import EffectOfFault as ef
+import Topology as tp
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# The RELRAD indices are linear in the failure rates of the components (Lambda += lambda, U += lambda * r), so the
+# outage durations of the load points are found once and any number of failure rate scenarios are evaluated with
+# matrix products. The outage durations that are the repair time of the component (faulted segment, no backup, full
+# system down) follow the repair time of a scenario, the other durations (switching times) are kept.
+
+REPAIR_STATES = ('fault', 'noBackup', 'fullSystemDown')
+
+
+def createDurationMatrix(loc, DSEBF=True, DERS=False, cache=False):
+    """
+    Calculates the outage duration of every load point for a fault in every component, as in RELRAD.RELRAD.
+
+    Args:
+        loc (str): Location of the input file.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+        cache (bool, optional): Flag indicating if the compiled system is stored in a cache file. Defaults to False.
+
+    Returns:
+        dict: The duration matrix (see systemDurationMatrix).
+    """
+    return systemDurationMatrix(cs.createSystem(loc, cache=cache), DSEBF=DSEBF, DERS=DERS)
+
+
+def systemDurationMatrix(system, DSEBF=True, DERS=False):
+    """
+    Calculates the outage duration of every load point for a fault in every component of a system.
+
+    Args:
+        system (dict): The system from CreateSystem.createSystem.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+
+    Returns:
+        dict: The duration matrix.
+            components/sections/loads: labels of the components (section + component) and their sections (rows),
+                and labels of the load points (columns)
+            lambda/r/s: failure rate, repair time and maximum switching time of each component
+            duration: outage duration of each load point for a fault in each component (components x loads)
+            repair: flag for the durations that are the repair time of the component
+            customers/averageLoad: number of customers and average load of each load point
+    """
+    matrix = matrixLayout(system)
+    fillDurations(matrix, system, range(len(matrix['components'])), DSEBF=DSEBF, DERS=DERS)
+    return matrix
+
+
+def matrixLayout(system):
+    """
+    Creates a duration matrix for a system with all durations zero (see systemDurationMatrix).
+
+    Args:
+        system (dict): The system from CreateSystem.createSystem.
+
+    Returns:
+        dict: The duration matrix.
+    """
+    sections = []
+    components = []
+    l = []
+    r = []
+    for sec in system['sections'].index:
+        for comp in system['sections']['Components'][sec]:
+            sections.append(sec)
+            components.append(sec + comp)
+            l.append(system['sections']['Components'][sec][comp]['lambda'])
+            r.append(system['sections']['Components'][sec][comp]['r'])
+
+    return {
+        'components': components,
+        'sections': sections,
+        'loads': list(system['loads'].index),
+        'lambda': np.array(l, dtype=np.float64),
+        'r': np.array(r, dtype=np.float64),
+        's': np.zeros(len(components), dtype=np.float64),
+        'duration': np.zeros((len(components), len(system['loads'].index))),
+        'repair': np.zeros((len(components), len(system['loads'].index)), dtype=bool),
+        'customers': system['loads']['Number of customers'].to_numpy(dtype=np.float64),
+        'averageLoad': system['loads']['Load level average [MW]'].to_numpy(dtype=np.float64),
+    }
+
+
+def fillDurations(matrix, system, rows, DSEBF=True, DERS=False):
+    """
+    Calculates the outage durations of the load points for the components in some rows of a duration matrix.
+
+    Args:
+        matrix (dict): The duration matrix (is updated).
+        system (dict): The system from CreateSystem.createSystem.
+        rows (iterable): The rows (components) to calculate.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+
+    Returns:
+        dict: The fault cache, with the structural outcome of the faults in the sections of the rows.
+    """
+    loadIndex = {LP: i for i, LP in enumerate(matrix['loads'])}
+    faultCache = ef.createFaultCache()
+    for n in rows:
+        sec = matrix['sections'][n]
+        comp = matrix['components'][n][len(sec):]
+        overlay = tp.createOverlay(system['topology'])
+        effectOnLPs, EOS = ef.faultEffects(sec, comp, overlay, system['loads'], system['generationData'], matrix['r'][n], DSEBF=DSEBF, DERS=DERS, createFIM=True, faultCache=faultCache)
+        outcome = faultCache['outcomes'][(system['topology']['sectionIndex'][sec], DSEBF)]
+        matrix['s'][n] = 0 if outcome['fullSystemDown'] else outcome['s']
+        matrix['duration'][n] = 0
+        matrix['repair'][n] = False
+        for LP in effectOnLPs:
+            matrix['duration'][n, loadIndex[LP]] = effectOnLPs[LP]
+        for i in EOS:
+            if i['state'] in REPAIR_STATES:
+                for LP in i['loads']:
+                    if effectOnLPs[LP] == i['time']:
+                        matrix['repair'][n, loadIndex[LP]] = True
+    return faultCache
+
+
+def sweep(matrix, lambdas=None, r=None):
+    """
+    Calculates the system indices for a set of failure rate and repair time scenarios. The durations that are not
+    the repair time keep their value from the duration matrix, i.e. a scenario keeps the backup feeder and
+    distributed generation decisions of the original repair times.
+
+    Args:
+        matrix (dict): The duration matrix from createDurationMatrix.
+        lambdas (array, optional): Failure rate of each component in each scenario (scenarios x components), or of
+            each component for all scenarios. Defaults to the failure rates of the matrix.
+        r (array, optional): Repair time of each component in each scenario, as lambdas. Defaults to the repair times
+            of the matrix.
+
+    Returns:
+        DataFrame: SAIFI, SAIDI, CAIDI and EENS of each scenario.
+    """
+    lambdas = np.atleast_2d(matrix['lambda'] if lambdas is None else np.asarray(lambdas, dtype=np.float64))
+    r = np.atleast_2d(matrix['r'] if r is None else np.asarray(r, dtype=np.float64))
+    lambdas, r = np.broadcast_arrays(lambdas, r)
+
+    # Customers and average load of the load points reached by each component, split in repair time and fixed durations
+    customers = matrix['customers'] / matrix['customers'].sum()
+    repair = matrix['repair']
+    fixed = np.where(repair, 0, matrix['duration'])
+    repairCustomers = repair @ customers
+    repairLoad = repair @ matrix['averageLoad']
+    fixedFrequency = (fixed > 0) @ customers
+    fixedCustomers = fixed @ customers
+    fixedLoad = fixed @ matrix['averageLoad']
+
+    # The outage duration is at least the switching time of the disconnectors (as in EffectOfFault.resolveFaultOutcome)
+    repairTime = np.maximum(r, matrix['s'])
+    SAIFI = (lambdas * (repairTime > 0)) @ repairCustomers + lambdas @ fixedFrequency
+    SAIDI = (lambdas * repairTime) @ repairCustomers + lambdas @ fixedCustomers
+    EENS = (lambdas * repairTime) @ repairLoad + lambdas @ fixedLoad
+    return pd.DataFrame({'SAIFI': SAIFI, 'SAIDI': SAIDI, 'CAIDI': SAIDI / SAIFI, 'EENS': EENS})
@@ -0,0 +1,286 @@
+import numpy as np
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# Integer codes for the 'Fuse/breaker direction' and 'Disconnector direction' columns
+NONE = 0        # 'N', no device
+UPSTREAM = 1    # 'U', device at the upstream end of the section
+DOWNSTREAM = 2  # 'D', device at the downstream end of the section
+BOTH = 3        # 'B', devices at both ends of the section
+DIRECTION_CODES = {'N': NONE, 'U': UPSTREAM, 'D': DOWNSTREAM, 'B': BOTH}
+
+NO_BUS = -1     # Replaces the 0 used in the DataFrames for a missing (or disconnected) bus or section
+
+
+def compileTopology(buses, sections, generationData, backupFeeders, loads):
+    """
+    Compiles the network into an integer indexed topology. Buses and sections are numbered in the order of the
+    DataFrames, and all the data needed by the graph searches is stored in NumPy arrays.
+
+    Args:
+        buses (DataFrame): Data about buses in the system (after fixbuses).
+        sections (DataFrame): Data about sections in the system.
+        generationData (DataFrame): Data about generation in the system.
+        backupFeeders (DataFrame): Data about backup feeders in the system.
+        loads (DataFrame): Data about loads in the system.
+
+    Returns:
+        dict: The compiled topology.
+            busLabels/sectionLabels: labels of the buses/sections, busIndex/sectionIndex: label to number
+            upstreamBus/downstreamBus: bus numbers at each end of a section (NO_BUS if none)
+            upstreamSection: upstream section of each bus (NO_BUS if none)
+            busOrder: buses ordered from the top of the feeders, each bus after the upstream end of its upstream section
+            adjacencyPtr/adjacency: connected sections of each bus in CSR format, the sections of bus b are
+                adjacency[adjacencyPtr[b]:adjacencyPtr[b+1]]
+            protection/disconnector: direction codes of the fuse/breaker and disconnector of each section
+            s: switching time of each section
+            mainFeeder: flag for the buses that are main feeders
+            backupFeederLabels/backupFeederEnds/backupFeederS: backup feeder labels, end buses (nr x 2) and switching times
+            busBackupFeederPtr/busBackupFeeders: backup feeders at each bus in CSR format, in the order of the backup feeders
+            openUpstream/openDownstream: disconnected section ends, always empty in the compiled topology
+            loadLabels/loadBus: labels and bus numbers of the load points (NO_BUS if the bus is missing)
+            busLoad/busGenerator: load point/generator number of each bus (NO_BUS if none)
+            busCustomers/busPeakLoad/busAverageLoad: number of customers, peak and average load of each bus
+            busGeneration/busConstantGeneration/busStorage: power of the generators (all, without storage) and
+                storage capacity of each bus, as used by GraphSearch.segmentAggregates
+    """
+    busLabels = list(buses.index)
+    sectionLabels = list(sections.index)
+    busIndex = {bus: i for i, bus in enumerate(busLabels)}
+    sectionIndex = {sec: i for i, sec in enumerate(sectionLabels)}
+
+    upstreamBus = np.array([busIndex.get(bus, NO_BUS) for bus in sections['Upstream Bus']], dtype=np.int32)
+    downstreamBus = np.array([busIndex.get(bus, NO_BUS) for bus in sections['Downstream Bus']], dtype=np.int32)
+
+    # Connected sections in the same order as in fixbuses (downstream sections first, then the upstream section)
+    upstreamSection = np.full(len(busLabels), NO_BUS, dtype=np.int32)
+    downstreamSections = [[] for i in range(len(busLabels))]
+    for sec in range(len(sectionLabels)):
+        if upstreamBus[sec] != NO_BUS:
+            downstreamSections[upstreamBus[sec]].append(sec)
+        if downstreamBus[sec] != NO_BUS:
+            upstreamSection[downstreamBus[sec]] = sec
+    adjacencyPtr = np.zeros(len(busLabels) + 1, dtype=np.int32)
+    adjacency = []
+    for bus in range(len(busLabels)):
+        adjacency += downstreamSections[bus]
+        if upstreamSection[bus] != NO_BUS:
+            adjacency.append(upstreamSection[bus])
+        adjacencyPtr[bus + 1] = len(adjacency)
+
+    # Buses ordered from the top of the feeders, every bus comes after the bus at the upstream end of its upstream section
+    busOrder = [bus for bus in range(len(busLabels)) if upstreamSection[bus] == NO_BUS or upstreamBus[upstreamSection[bus]] == NO_BUS]
+    reached = bytearray(len(busLabels))
+    for bus in busOrder:
+        reached[bus] = 1
+    n = 0
+    while n < len(busOrder):
+        for sec in downstreamSections[busOrder[n]]:
+            bus = downstreamBus[sec]
+            if bus != NO_BUS and not reached[bus]:
+                reached[bus] = 1
+                busOrder.append(bus)
+        n += 1
+    busOrder += [bus for bus in range(len(busLabels)) if not reached[bus]]
+
+    mainFeeder = np.zeros(len(busLabels), dtype=bool)
+    for bus in generationData.index:
+        if bus in busIndex:
+            mainFeeder[busIndex[bus]] = bool(generationData['Main Feeder'][bus])
+
+    backupFeederEnds = np.array([[busIndex.get(backupFeeders['End 1'][n], NO_BUS), busIndex.get(backupFeeders['End 2'][n], NO_BUS)]
+                                 for n in backupFeeders.index], dtype=np.int32).reshape(-1, 2)
+    busBackupFeeders = [[] for i in range(len(busLabels))]
+    for n, ends in enumerate(backupFeederEnds):
+        for bus in dict.fromkeys(ends):
+            if bus != NO_BUS:
+                busBackupFeeders[bus].append(n)
+    busBackupFeederPtr = np.zeros(len(busLabels) + 1, dtype=np.int32)
+    busBackupFeederPtr[1:] = np.cumsum([len(i) for i in busBackupFeeders])
+
+    # Load points and generators of each bus
+    loadLabels = list(loads.index)
+    loadBus = np.array([busIndex.get(LP, NO_BUS) for LP in loadLabels], dtype=np.int32)
+    busLoad = np.full(len(busLabels), NO_BUS, dtype=np.int32)
+    busCustomers = np.zeros(len(busLabels), dtype=np.float64)
+    busPeakLoad = np.zeros(len(busLabels), dtype=np.float64)
+    busAverageLoad = np.zeros(len(busLabels), dtype=np.float64)
+    for n, LP in enumerate(loadLabels):
+        if loadBus[n] != NO_BUS:
+            busLoad[loadBus[n]] = n
+            busCustomers[loadBus[n]] = loads['Number of customers'][LP]
+            busPeakLoad[loadBus[n]] = loads['Load point peak [MW]'][LP]
+            busAverageLoad[loadBus[n]] = loads['Load level average [MW]'][LP]
+
+    busGenerator = np.full(len(busLabels), NO_BUS, dtype=np.int32)
+    busGeneration = np.zeros(len(busLabels), dtype=np.float64)
+    busConstantGeneration = np.zeros(len(busLabels), dtype=np.float64)
+    busStorage = np.zeros(len(busLabels), dtype=np.float64)
+    # Systems without storage may leave out the 'E cap' column
+    storage = generationData['E cap'] if 'E cap' in generationData.columns else {bus: 0 for bus in generationData.index}
+    for n, bus in enumerate(generationData.index):
+        if bus in busIndex:
+            busGenerator[busIndex[bus]] = n
+            if generationData['Lim MW'][bus] > 0 and storage[bus] == 0:
+                busGeneration[busIndex[bus]] = generationData['Lim MW'][bus]
+                busConstantGeneration[busIndex[bus]] = generationData['Lim MW'][bus]
+            elif generationData['Lim MW'][bus] > 0 and storage[bus] > 0:
+                busGeneration[busIndex[bus]] = generationData['Lim MW'][bus]
+                busStorage[busIndex[bus]] = storage[bus]
+
+    return {
+        'busLabels': busLabels,
+        'busIndex': busIndex,
+        'sectionLabels': sectionLabels,
+        'sectionIndex': sectionIndex,
+        'upstreamBus': upstreamBus,
+        'downstreamBus': downstreamBus,
+        'upstreamSection': upstreamSection,
+        'busOrder': np.array(busOrder, dtype=np.int32),
+        'adjacencyPtr': adjacencyPtr,
+        'adjacency': np.array(adjacency, dtype=np.int32),
+        'protection': np.array([DIRECTION_CODES[d] for d in sections['Fuse/breaker direction']], dtype=np.int8),
+        'disconnector': np.array([DIRECTION_CODES[d] for d in sections['Disconnector direction']], dtype=np.int8),
+        's': sections['s'].to_numpy(dtype=np.float64),
+        'mainFeeder': mainFeeder,
+        'backupFeederLabels': list(backupFeeders.index),
+        'backupFeederEnds': backupFeederEnds,
+        'backupFeederS': backupFeeders['s'].to_numpy(dtype=np.float64),
+        'busBackupFeederPtr': busBackupFeederPtr,
+        'busBackupFeeders': np.array([n for i in busBackupFeeders for n in i], dtype=np.int32),
+        'openUpstream': frozenset(),
+        'openDownstream': frozenset(),
+        'loadLabels': loadLabels,
+        'loadBus': loadBus,
+        'busLoad': busLoad,
+        'busCustomers': busCustomers,
+        'busPeakLoad': busPeakLoad,
+        'busAverageLoad': busAverageLoad,
+        'busGenerator': busGenerator,
+        'busGeneration': busGeneration,
+        'busConstantGeneration': busConstantGeneration,
+        'busStorage': busStorage,
+    }
+
+
+def createOverlay(topology):
+    """
+    Creates a topology overlay for the analysis of one fault. The arrays of the compiled topology are shared and
+    never changed, the overlay only records the section ends that are disconnected by the protection and the
+    disconnectors. Creating and discarding an overlay does not depend on the size of the system.
+
+    Args:
+        topology (dict): The compiled topology.
+
+    Returns:
+        dict: The topology overlay, used in place of the topology by the graph searches.
+    """
+    overlay = topology.copy()
+    overlay['openUpstream'] = set()
+    overlay['openDownstream'] = set()
+    return overlay
+
+
+def upstreamBus(section, topology):
+    """
+    Finds the bus at the upstream end of a section.
+
+    Args:
+        section (int): The section.
+        topology (dict): The compiled topology or a topology overlay.
+
+    Returns:
+        int: The upstream bus, or NO_BUS if there is none or the end is disconnected.
+    """
+    if section in topology['openUpstream']:
+        return NO_BUS
+    return topology['upstreamBus'][section]
+
+
+def downstreamBus(section, topology):
+    """
+    Finds the bus at the downstream end of a section.
+
+    Args:
+        section (int): The section.
+        topology (dict): The compiled topology or a topology overlay.
+
+    Returns:
+        int: The downstream bus, or NO_BUS if there is none or the end is disconnected.
+    """
+    if section in topology['openDownstream']:
+        return NO_BUS
+    return topology['downstreamBus'][section]
+
+
+def openUpstream(section, topology):
+    """
+    Disconnects the upstream end of a section.
+
+    Args:
+        section (int): The section.
+        topology (dict): The topology overlay (is updated).
+    """
+    topology['openUpstream'].add(section)
+
+
+def openDownstream(section, topology):
+    """
+    Disconnects the downstream end of a section.
+
+    Args:
+        section (int): The section.
+        topology (dict): The topology overlay (is updated).
+    """
+    topology['openDownstream'].add(section)
+
+
+def closeUpstream(section, topology):
+    """
+    Reconnects the upstream end of a section.
+
+    Args:
+        section (int): The section.
+        topology (dict): The topology overlay (is updated).
+    """
+    topology['openUpstream'].discard(section)
+
+
+def closeDownstream(section, topology):
+    """
+    Reconnects the downstream end of a section.
+
+    Args:
+        section (int): The section.
+        topology (dict): The topology overlay (is updated).
+    """
+    topology['openDownstream'].discard(section)
+
+
+def setOpenEnds(openUpstream, openDownstream, topology):
+    """
+    Replaces the disconnected section ends of a topology overlay, e.g. with a stage of a precomputed fault zone.
+
+    Args:
+        openUpstream (iterable): Sections with the upstream end disconnected.
+        openDownstream (iterable): Sections with the downstream end disconnected.
+        topology (dict): The topology overlay (is updated).
+    """
+    topology['openUpstream'] = set(openUpstream)
+    topology['openDownstream'] = set(openDownstream)
@@ -88,4 +88,42 @@ def calcConfidenceInterval(EENS):
     n = len(EENS) # Sample size
     
     return {'CI95':(meanEENS - (1.96 * (np.sqrt(stdEENS) / np.sqrt(n))), meanEENS + (1.96 * (np.sqrt(stdEENS) / np.sqrt(n)))), 
-            'CI99':(meanEENS - (2.576 * (np.sqrt(stdEENS) / np.sqrt(n))), meanEENS + (2.576 * (np.sqrt(stdEENS) / np.sqrt(n))))}
\ No newline at end of file
+            'CI99':(meanEENS - (2.576 * (np.sqrt(stdEENS) / np.sqrt(n))), meanEENS + (2.576 * (np.sqrt(stdEENS) / np.sqrt(n))))}
+
+def createRunningStats():
+    """
+    Creates running statistics of the yearly EENS values (Welford's algorithm), so the convergence can be checked
+    while the simulation runs without keeping all values.
+
+    Returns:
+        dict: Number of values, mean and sum of squared differences from the mean.
+    """
+    return {'n': 0, 'mean': 0.0, 'M2': 0.0}
+
+def updateRunningStats(stats, EENS):
+    """
+    Adds a yearly EENS value to the running statistics.
+
+    Args:
+        stats (dict): The running statistics (is updated).
+        EENS (float): EENS of the year.
+    """
+    stats['n'] += 1
+    delta = EENS - stats['mean']
+    stats['mean'] += delta / stats['n']
+    stats['M2'] += delta * (EENS - stats['mean'])
+
+def runningBeta(stats):
+    """
+    Calculates the beta value (coefficient of variation of the EENS estimate) from the running statistics.
+
+    Args:
+        stats (dict): The running statistics.
+
+    Returns:
+        float: The beta value, inf if it can not be calculated yet.
+    """
+    if stats['n'] < 2 or stats['mean'] == 0:
+        return np.inf
+    varEENS = stats['M2'] / (stats['n'] - 1)
+    return np.sqrt(varEENS) / (stats['mean'] * np.sqrt(stats['n']))
@@ -0,0 +1,342 @@
+import pandas as pd
+import CreateSystem as cs
+import GraphSearch as gs
+import ScenarioSweep as sw
+import Topology as tp
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# A small edit of the protection, the disconnectors or the backup feeders only changes the outcome of some faults:
+#   - the fault zone of a section depends on the protection between the section and the main feeder, and on the
+#     disconnectors reached from the section through sections without a disconnector
+#   - the backup feeders of an unsupplied segment depend on the feeders at its buses, and with DSEBF on the protection
+#     upstream of the other end of the feeders
+# Only the fault zones that can depend on the edit are recomputed, and only the components in sections with a changed
+# fault zone, or with an unsupplied segment at an edited backup feeder, are recalculated in the duration matrix.
+
+SECTION_COLUMNS = ('Fuse/breaker direction', 'Disconnector direction', 's')
+BACKUP_FEEDER_COLUMNS = ('End 1', 'End 2', 's')
+
+
+def createWhatIf(loc, DSEBF=True, DERS=False, cache=False):
+    """
+    Calculates the base result for what-if studies of a system (see evaluateEdit).
+
+    Args:
+        loc (str): Location of the input file.
+        DSEBF (bool, optional): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+        DERS (bool, optional): Flag indicating if distributed energy resources are used. Defaults to False.
+        cache (bool, optional): Flag indicating if the compiled system is stored in a cache file. Defaults to False.
+
+    Returns:
+        dict: The base result.
+            system: the system from CreateSystem.createSystem
+            matrix: the duration matrix from ScenarioSweep.systemDurationMatrix
+            unsupplied: buses in the unsupplied segments for a fault in each section (section numbers)
+            DSEBF/DERS: the options of the result
+            indices: SAIFI, SAIDI, CAIDI and EENS of the system
+            recomputed: number of sections recalculated for the result
+    """
+    system = cs.createSystem(loc, cache=cache)
+    matrix = sw.matrixLayout(system)
+    faultCache = sw.fillDurations(matrix, system, range(len(matrix['components'])), DSEBF=DSEBF, DERS=DERS)
+    return {
+        'system': system,
+        'matrix': matrix,
+        'unsupplied': unsuppliedBuses(faultCache, system['topology']),
+        'DSEBF': DSEBF,
+        'DERS': DERS,
+        'indices': sw.sweep(matrix).iloc[0],
+        'recomputed': len(system['sections'].index)
+    }
+
+
+def unsuppliedBuses(faultCache, topology):
+    """
+    Finds the buses in the unsupplied segments of the faults in a fault cache.
+
+    Args:
+        faultCache (dict): The fault cache from ScenarioSweep.fillDurations.
+        topology (dict): The compiled topology.
+
+    Returns:
+        dict: Set of bus numbers for each faulted section number.
+    """
+    unsupplied = {}
+    for (fault, DSEBF), outcome in faultCache['outcomes'].items():
+        buses = set()
+        if not outcome['fullSystemDown']:
+            for i in outcome['segments']:
+                if i['state'] == 'unsupplied':
+                    buses.update(topology['busIndex'][bus] for bus in i['buses'])
+        unsupplied[fault] = buses
+    return unsupplied
+
+
+def editSystem(system, edit):
+    """
+    Applies an edit to a copy of a system and compiles its topology, the fault zones are not compiled.
+
+    Args:
+        system (dict): The system from CreateSystem.createSystem.
+        edit (dict): The edit, either
+            {'section': label, 'Fuse/breaker direction': 'N'/'U'/'D'/'B', 'Disconnector direction': ..., 's': ...}
+                with one or more of the columns, or
+            {'backupFeeder': label, 'End 1': bus, 'End 2': bus, 's': ...} to add or change a backup feeder, or
+            {'backupFeeder': label, 'remove': True} to remove a backup feeder.
+
+    Returns:
+        dict: The edited system.
+    """
+    system = dict(system)
+    if 'section' in edit:
+        if edit['section'] not in system['sections'].index:
+            raise KeyError('Unknown section %s' % edit['section'])
+        system['sections'] = system['sections'].copy()
+        for column in SECTION_COLUMNS:
+            if column in edit:
+                system['sections'].at[edit['section'], column] = edit[column]
+    if 'backupFeeder' in edit:
+        backupFeeders = system['backupFeeders'].copy()
+        if edit.get('remove', False):
+            backupFeeders = backupFeeders.drop(edit['backupFeeder'])
+        else:
+            for column in BACKUP_FEEDER_COLUMNS:
+                if column in edit:
+                    backupFeeders.loc[edit['backupFeeder'], column] = edit[column]
+        system['backupFeeders'] = backupFeeders
+    system['topology'] = tp.compileTopology(system['buses'], system['sections'], system['generationData'], system['backupFeeders'], system['loads'])
+    return system
+
+
+def busesBelow(bus, topology):
+    """
+    Finds a bus and the buses downstream of it.
+
+    Args:
+        bus (int): The bus.
+        topology (dict): The compiled topology.
+
+    Returns:
+        set: The bus numbers.
+    """
+    adjacencyPtr = topology['adjacencyPtr']
+    adjacency = topology['adjacency']
+    below = {bus}
+    stack = [bus]
+    while stack:
+        bus = stack.pop()
+        for sec in adjacency[adjacencyPtr[bus]:adjacencyPtr[bus + 1]]:
+            nextBus = topology['downstreamBus'][sec]
+            if topology['upstreamBus'][sec] == bus and nextBus != tp.NO_BUS and nextBus not in below:
+                below.add(nextBus)
+                stack.append(nextBus)
+    return below
+
+
+def disconnectorArea(section, topology):
+    """
+    Finds the buses reached from the ends of a section through sections without a disconnector.
+
+    Args:
+        section (int): The section.
+        topology (dict): The compiled topology.
+
+    Returns:
+        set: The bus numbers.
+    """
+    adjacencyPtr = topology['adjacencyPtr']
+    adjacency = topology['adjacency']
+    area = {bus for bus in (topology['upstreamBus'][section], topology['downstreamBus'][section]) if bus != tp.NO_BUS}
+    stack = list(area)
+    while stack:
+        bus = stack.pop()
+        for sec in adjacency[adjacencyPtr[bus]:adjacencyPtr[bus + 1]]:
+            if sec == section or topology['disconnector'][sec] != tp.NONE:
+                continue
+            for nextBus in (topology['upstreamBus'][sec], topology['downstreamBus'][sec]):
+                if nextBus != tp.NO_BUS and nextBus not in area:
+                    area.add(nextBus)
+                    stack.append(nextBus)
+    return area
+
+
+def sectionsAt(buses, topology):
+    """
+    Finds the sections connected to a set of buses.
+
+    Args:
+        buses (iterable): The bus numbers.
+        topology (dict): The compiled topology.
+
+    Returns:
+        set: The section numbers.
+    """
+    adjacencyPtr = topology['adjacencyPtr']
+    adjacency = topology['adjacency']
+    return {int(sec) for bus in buses for sec in adjacency[adjacencyPtr[bus]:adjacencyPtr[bus + 1]]}
+
+
+def feederEnds(feeders, topology):
+    """
+    Finds the end buses of some backup feeders.
+
+    Args:
+        feeders (iterable): Labels of the backup feeders, the ones not in the topology are left out.
+        topology (dict): The compiled topology.
+
+    Returns:
+        set: The bus numbers.
+    """
+    labels = topology['backupFeederLabels']
+    return {int(bus) for n in range(len(labels)) if labels[n] in feeders
+            for bus in topology['backupFeederEnds'][n] if bus != tp.NO_BUS}
+
+
+def affectedSections(edit, old, new, DSEBF):
+    """
+    Finds the sections whose fault zone can be changed by an edit, and the buses whose backup feeders can be changed.
+
+    Args:
+        edit (dict): The edit (see editSystem).
+        old (dict): The compiled topology before the edit.
+        new (dict): The compiled topology after the edit.
+        DSEBF (bool): (Down Stream Effect of Backup Feeder) Flag indicating if backup feeders creates a outage on  the secondry side.
+
+    Returns:
+        tuple: Set of candidate section numbers and set of bus numbers.
+    """
+    candidates = set()
+    buses = set()
+    if 'section' in edit:
+        section = old['sectionIndex'][edit['section']]
+        if old['protection'][section] != new['protection'][section] and new['downstreamBus'][section] != tp.NO_BUS:
+            # The protection is found by searching upstream from the faulted section
+            below = busesBelow(new['downstreamBus'][section], new)
+            candidates.add(section)
+            candidates.update(sec for sec in sectionsAt(below, new) if new['upstreamBus'][sec] in below)
+            if DSEBF:
+                # The protection upstream of the other end of a backup feeder limits its downstream effect
+                feeders = {int(n) for bus in below for n in new['busBackupFeeders'][new['busBackupFeederPtr'][bus]:new['busBackupFeederPtr'][bus + 1]]}
+                buses.update(int(bus) for n in feeders for bus in new['backupFeederEnds'][n] if bus != tp.NO_BUS)
+        elif old['protection'][section] != new['protection'][section]:
+            candidates.add(section)
+        if old['disconnector'][section] != new['disconnector'][section] or old['s'][section] != new['s'][section]:
+            # The disconnectors are found by searching from the faulted section through sections without a disconnector
+            candidates.add(section)
+            candidates.update(sectionsAt(disconnectorArea(section, old), old))
+    if 'backupFeeder' in edit:
+        buses.update(feederEnds([edit['backupFeeder']], old))
+        buses.update(feederEnds([edit['backupFeeder']], new))
+    return candidates, buses
+
+
+def evaluateEdit(base, edit):
+    """
+    Calculates the result of a system with an edit incrementally from a base result, only the components in the
+    sections affected by the edit are recalculated.
+
+    Args:
+        base (dict): The base result from createWhatIf (or evaluateEdit).
+        edit (dict): The edit (see editSystem).
+
+    Returns:
+        dict: The result of the edited system, in the same format as the base result.
+    """
+    old = base['system']['topology']
+    system = editSystem(base['system'], edit)
+    new = system['topology']
+    candidates, buses = affectedSections(edit, old, new, base['DSEBF'])
+
+    zones = list(old['faultZones'])
+    sections = set()
+    for sec in candidates:
+        zone = gs.faultZone(sec, new)
+        if zone != zones[sec]:
+            zones[sec] = zone
+            sections.add(sec)
+    new['faultZones'] = zones
+    sections.update(sec for sec in base['unsupplied'] if base['unsupplied'][sec] & buses)
+
+    matrix = dict(base['matrix'])
+    for key in ('s', 'duration', 'repair'):
+        matrix[key] = matrix[key].copy()
+    rows = [n for n, sec in enumerate(matrix['sections']) if new['sectionIndex'][sec] in sections]
+    faultCache = sw.fillDurations(matrix, system, rows, DSEBF=base['DSEBF'], DERS=base['DERS'])
+    unsupplied = dict(base['unsupplied'])
+    unsupplied.update(unsuppliedBuses(faultCache, new))
+    return {
+        'system': system,
+        'matrix': matrix,
+        'unsupplied': unsupplied,
+        'DSEBF': base['DSEBF'],
+        'DERS': base['DERS'],
+        'indices': sw.sweep(matrix).iloc[0],
+        'recomputed': len(sections)
+    }
+
+
+def describeEdit(edit):
+    """
+    Describes an edit in one line.
+
+    Args:
+        edit (dict): The edit (see editSystem).
+
+    Returns:
+        str: The description, e.g. 'S3 Disconnector direction=B' or 'BS1 removed'.
+    """
+    if 'section' in edit:
+        return ' '.join([edit['section']] + ['%s=%s' % (column, edit[column]) for column in SECTION_COLUMNS if column in edit])
+    if edit.get('remove', False):
+        return '%s removed' % edit['backupFeeder']
+    return ' '.join([edit['backupFeeder']] + ['%s=%s' % (column, edit[column]) for column in BACKUP_FEEDER_COLUMNS if column in edit])
+
+
+def rankEdits(base, edits, by='SAIDI'):
+    """
+    Evaluates a batch of candidate edits against a base result and ranks them by the reduction of an index.
+
+    Args:
+        base (dict): The base result from createWhatIf.
+        edits (list): The candidate edits (see editSystem).
+        by (str, optional): The index to rank by, 'SAIDI' or 'EENS'. Defaults to 'SAIDI'.
+
+    Returns:
+        DataFrame: The indices of each edit and their reduction from the base result, the largest reduction first. The
+            index is the position of the edit in edits.
+    """
+    if by not in ('SAIDI', 'EENS'):
+        raise ValueError('Unknown index %s, use SAIDI or EENS' % by)
+    rows = []
+    for edit in edits:
+        result = evaluateEdit(base, edit)
+        rows.append({
+            'Edit': describeEdit(edit),
+            'SAIFI': result['indices']['SAIFI'],
+            'SAIDI': result['indices']['SAIDI'],
+            'CAIDI': result['indices']['CAIDI'],
+            'EENS': result['indices']['EENS'],
+            'SAIDI reduction': base['indices']['SAIDI'] - result['indices']['SAIDI'],
+            'EENS reduction': base['indices']['EENS'] - result['indices']['EENS'],
+            'Recomputed sections': result['recomputed']
+        })
+    ranking = pd.DataFrame(rows, columns=['Edit', 'SAIFI', 'SAIDI', 'CAIDI', 'EENS', 'SAIDI reduction', 'EENS reduction', 'Recomputed sections'])
+    other = 'EENS' if by == 'SAIDI' else 'SAIDI'
+    return ranking.sort_values([by + ' reduction', other + ' reduction'], ascending=False, kind='stable')
@@ -0,0 +1,67 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# The modules of the repository are imported by name, as in Main.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def unprotectedBackupSystem(tmp_path):
+    """
+    Writes a system where the backup feeder ends below a feeder path without upstream protection, the only protection
+    above the other end (B5) of the backup feeder is the D-fuse on its own upstream section (S6).
+
+        B1 -S1(U)- B2 -S2- B3 -S3- LP3
+        B1 -S4- B4 -S5- LP4
+                B4 -S6(D)- B5 -S7- LP5
+        Backup feeder BF1 between B3 and B5
+
+    Returns:
+        str: Location of the input file.
+    """
+    file = str(tmp_path / 'unprotectedBackup.xlsx')
+    lines = pd.DataFrame.from_dict({
+        'S1': ['B1', 'B2', 'U', 'N'],
+        'S2': ['B2', 'B3', 'N', 'B'],
+        'S3': ['B3', 'LP3', 'N', 'N'],
+        'S4': ['B1', 'B4', 'N', 'N'],
+        'S5': ['B4', 'LP4', 'N', 'N'],
+        'S6': ['B4', 'B5', 'D', 'N'],
+        'S7': ['B5', 'LP5', 'N', 'N'],
+    }, orient='index', columns=['Upstream Bus', 'Downstream Bus', 'Fuse/breaker direction', 'Disconnector direction'])
+    lines.insert(0, 'Length', 1.0)
+    lines['Cable Type'] = 'Line 1'
+    lines['Nr Transformers'] = 0
+    lines['Transformer Type'] = 0
+    loads = pd.DataFrame({'Customer type': 'residential', 'Load level average [MW]': 0.5, 'Load point peak [MW]': 1.0, 'Number of customers': 100},
+                         index=['LP3', 'LP4', 'LP5'])
+    with pd.ExcelWriter(file) as writer:
+        pd.DataFrame(index=['B1', 'B2', 'B3', 'B4', 'B5', 'LP3', 'LP4', 'LP5']).to_excel(writer, sheet_name='Bus Data')
+        lines.to_excel(writer, sheet_name='Line Data')
+        loads.to_excel(writer, sheet_name='Load Point Data')
+        pd.DataFrame({'Lim MW': [np.inf], 'E cap': [np.inf], 'Main Feeder': [True]}, index=['B1']).to_excel(writer, sheet_name='Generation Data')
+        pd.DataFrame({'End 1': ['B3'], 'End 2': ['B5'], 's': [1.0]}, index=['BF1']).to_excel(writer, sheet_name='Backup Feeders')
+        pd.DataFrame({'lambda': [0.1], 'r': [4], 's': [0.5]}, index=pd.Index(['Line 1'], name='Component')).to_excel(writer, sheet_name='Component Data')
+    return file
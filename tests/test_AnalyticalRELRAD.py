@@ -0,0 +1,77 @@
+import glob
+import itertools
+import os
+import pandas as pd
+import pytest
+import RELRAD as rr
+import ImpactMatrix as im
+from conftest import ROOT
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# The input files of the test systems, files without the sheets of the input template are not systems
+SYSTEMS = sorted(glob.glob(os.path.join(ROOT, 'Test Systems', '*.xlsx')))
+OPTIONS = list(itertools.product([True, False], [False, True]))  # (DSEBF, DERS)
+
+
+def readSystem(file):
+    if 'Bus Data' not in pd.ExcelFile(file).sheet_names:
+        pytest.skip('%s is not in the input format' % os.path.basename(file))
+    return file
+
+
+def loadPoints(loc, outFile, **options):
+    rr.RELRAD(loc, outFile, **options)
+    return pd.read_excel(outFile, sheet_name='Load Points', index_col=0)
+
+
+@pytest.mark.parametrize('DSEBF, DERS', OPTIONS)
+@pytest.mark.parametrize('file', SYSTEMS, ids=os.path.basename)
+def test_analyticalLoadPoints(file, DSEBF, DERS, tmp_path):
+    # The analytical RELRAD gives the same load point indices as the analysis of every component
+    loc = readSystem(file)
+    expected = loadPoints(loc, str(tmp_path / 'components.xlsx'), DSEBF=DSEBF, DERS=DERS)
+    result = loadPoints(loc, str(tmp_path / 'analytical.xlsx'), DSEBF=DSEBF, DERS=DERS, analytical=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('DSEBF, DERS', OPTIONS)
+def test_analyticalUnprotectedBackup(unprotectedBackupSystem, DSEBF, DERS, tmp_path):
+    # The backup feeder region reaches the top of the feeder in both engines (no protection above the D-fuse)
+    expected = loadPoints(unprotectedBackupSystem, str(tmp_path / 'components.xlsx'), DSEBF=DSEBF, DERS=DERS)
+    result = loadPoints(unprotectedBackupSystem, str(tmp_path / 'analytical.xlsx'), DSEBF=DSEBF, DERS=DERS, analytical=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('DSEBF', [True, False])
+@pytest.mark.parametrize('file', SYSTEMS, ids=os.path.basename)
+def test_FIM(file, DSEBF, tmp_path):
+    # The FIM is the same on separate processes and in long format as in the FIM sheet of one process
+    loc = readSystem(file)
+    rr.RELRAD(loc, str(tmp_path / 'serial.xlsx'), DSEBF=DSEBF, DERS=True, createFIM=True)
+    expected = pd.read_excel(str(tmp_path / 'serial.xlsx'), sheet_name='FIM', index_col=0, dtype=str)
+    rr.RELRAD(loc, str(tmp_path / 'processes.xlsx'), DSEBF=DSEBF, DERS=True, createFIM=True, processes=True, workers=2)
+    result = pd.read_excel(str(tmp_path / 'processes.xlsx'), sheet_name='FIM', index_col=0, dtype=str)
+    pd.testing.assert_frame_equal(result, expected)
+
+    rr.RELRAD(loc, str(tmp_path / 'long.xlsx'), DSEBF=DSEBF, DERS=True, createFIM=True, FIMFile=str(tmp_path / 'FIM.csv'))
+    columns = pd.read_csv(str(tmp_path / 'FIM.csv'), dtype=str)
+    result = columns.pivot(index='Section', columns='Load point', values='State')
+    cells = expected.stack()
+    pd.testing.assert_series_equal(result.stack().sort_index(), cells.sort_index(), check_names=False, check_index_type=False)
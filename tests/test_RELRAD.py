@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+import CreateSystem as cs
+import GraphSearch as gs
+import Topology as tp
+import RELRAD as rr
+
+'''
+RELRAD-software, general software for reliability studies of radial power systems
+    Copyright (C) 2025  Sondre Modalsli Aaberg
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def test_findProtectionAtFeederTop(unprotectedBackupSystem):
+    # Without protection above the D-fuse, the feeder breaker at the top bus protects the bus
+    topology = cs.createSystem(unprotectedBackupSystem)['topology']
+    breaker = gs.findProtection(topology['busIndex']['B5'], topology)
+    assert breaker['bus'] == topology['busIndex']['B1']
+    assert breaker['direction'] == 'U'
+    assert breaker['section'] == topology['sectionIndex']['S4']
+    breaker = gs.findProtection(topology['busIndex']['B1'], topology)
+    assert breaker == {'section': tp.NO_BUS, 'bus': topology['busIndex']['B1'], 'direction': 'U'}
+
+
+def test_backupFeederBelowUnprotectedFeeder(unprotectedBackupSystem, tmp_path):
+    # A fault on S2 is supplied through BF1, the Down Stream Effect of Backup Feeder reaches the top of the other feeder
+    outFile = str(tmp_path / 'results.xlsx')
+    rr.RELRAD(unprotectedBackupSystem, outFile, DSEBF=True, createFIM=True)
+    FIM = pd.read_excel(outFile, sheet_name='FIM', index_col=0, dtype=str)
+    assert FIM.loc['S2'].tolist() == ['B', 'M', 'M']
+    loads = pd.read_excel(outFile, sheet_name='Load Points', index_col=0)
+    assert loads.at['TOTAL', 'EENS'] == pytest.approx(2.4)
+
+    rr.RELRAD(unprotectedBackupSystem, outFile, DSEBF=False, createFIM=True)
+    FIM = pd.read_excel(outFile, sheet_name='FIM', index_col=0, dtype=str)
+    assert FIM.loc['S2'].tolist() == ['B', '0', '0']
+    loads = pd.read_excel(outFile, sheet_name='Load Points', index_col=0)
+    assert loads.at['TOTAL', 'EENS'] == pytest.approx(2.3)